@@ -1,14 +1,20 @@
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional
 import os
 import json
+import pandas as pd
 
-from models.location_analyzer import LocationAnalyzer
-from models.demand_forecaster import DemandForecaster
-from models.client_segmenter import ClientSegmenter
+from models.registry import ModelRegistry, ArtifactWatcher
+from models.forecast_store import ForecastStore
+from models.revenue_heatmap import load_revenue_heatmap
+from models.site_optimizer import SiteOptimizer, SITE_DECAY_M, SITE_CANNIBALIZATION, SITE_COMPETITOR_PENALTY
 from utils.overpass_provider import OverpassPOIProvider
 from utils.macro_provider import MacroDataProvider
+from utils.async_http import close_async_client
+from utils.micro_batcher import MicroBatcher
 
 app = FastAPI(
     title="Альфа-Аналитика B2B API",
@@ -16,27 +22,91 @@ app = FastAPI(
     version="2.0.0"
 )
 
-location_analyzer = LocationAnalyzer()
-demand_forecaster = DemandForecaster()
-client_segmenter = ClientSegmenter()
+# Set by gunicorn.conf.py: load models in the preloading master so forked
+# workers share the pages copy-on-write instead of each holding a copy
+PRELOAD_MODELS = os.getenv("ALFA_PRELOAD_MODELS", "0") == "1"
+
+model_registry = ModelRegistry()
+if PRELOAD_MODELS:
+    model_registry.load_all()
+model_watcher = ArtifactWatcher(model_registry)
 overpass_provider = OverpassPOIProvider()
 macro_provider = MacroDataProvider()
+forecast_store = ForecastStore()
+
+# Concurrent single-row requests are coalesced into one vectorized predict
+location_batcher = MicroBatcher(
+    lambda rows: model_registry.get("location_analyzer").predict_many(pd.DataFrame(rows)).to_dict(orient="records")
+)
+segment_batcher = MicroBatcher(
+    lambda rows: model_registry.get("client_segmenter").segment_many_by_metrics(pd.DataFrame(rows)).to_dict(orient="records")
+)
+
+@app.on_event("startup")
+async def load_models():
+    # Deserialize and warm up trained artifacts before serving traffic
+    if not model_registry.loaded:
+        model_registry.load_all()
+    # Pick up nightly retrained artifacts without restarting the worker
+    model_watcher.start()
+
+@app.on_event("startup")
+async def warm_macro_cache():
+    # Kick off the first CBR fetch in the background so forecasts never wait on it
+    macro_provider.get_cached_rates()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    model_watcher.stop()
+    await close_async_client()
 
 class LocationRequest(BaseModel):
     pedestrian_traffic: float = Field(..., description="Пешеходный трафик (чел/день)", ge=0)
     avg_purchase_value: float = Field(..., description="Средний чек (руб.)", ge=0)
     district: str = Field("central", description="Район города")
 
+class LocationBatchRequest(BaseModel):
+    locations: List[LocationRequest] = Field(..., description="Список локаций для пакетной оценки", min_length=1)
+
 class LocationCoordsRequest(BaseModel):
     lat: float = Field(55.7558, description="Широта локации")
     lon: float = Field(37.6173, description="Долгота локации")
     avg_purchase_value: float = Field(2500.0, description="Предполагаемый средний чек")
 
+class SiteCandidate(BaseModel):
+    lat: float = Field(..., description="Широта кандидата")
+    lon: float = Field(..., description="Долгота кандидата")
+    pedestrian_traffic: Optional[float] = Field(None, description="Трафик (если не задан — по локальным POI)", ge=0)
+
+class SiteOptimizationRequest(BaseModel):
+    candidates: List[SiteCandidate] = Field(..., description="Точки-кандидаты", min_length=1, max_length=50000)
+    k: int = Field(10, description="Сколько точек открыть", ge=1, le=500)
+    avg_purchase_value: float = Field(2500.0, description="Предполагаемый средний чек", ge=0)
+    competitors: List[SiteCandidate] = Field([], description="Существующие точки конкурентов")
+    decay_m: float = Field(SITE_DECAY_M, description="Масштаб затухания каннибализации (м)", gt=0)
+    cannibalization: float = Field(SITE_CANNIBALIZATION, description="Доля выручки, теряемая соседними точками на нулевом расстоянии", ge=0, le=1)
+    competitor_penalty: float = Field(SITE_COMPETITOR_PENALTY, description="Потеря выручки от конкурента на нулевом расстоянии", ge=0, le=1)
+    min_distance_m: float = Field(0.0, description="Минимальное расстояние между выбранными точками (м)", ge=0)
+
 class DemandRequest(BaseModel):
     category: str = Field("electronics", description="Категория товаров")
     region: str = Field("Moscow", description="Регион")
     periods: int = Field(6, description="Количество месяцев для прогноза", ge=1, le=24)
 
+class DemandCubeRequest(BaseModel):
+    periods: int = Field(12, description="Количество месяцев для прогноза", ge=1, le=24)
+    categories: Optional[List[str]] = Field(None, description="Срез по категориям (по умолчанию все)")
+    regions: Optional[List[str]] = Field(None, description="Срез по регионам (по умолчанию все)")
+
+class DemandScenarioRequest(BaseModel):
+    periods: int = Field(24, description="Количество месяцев для прогноза", ge=1, le=24)
+    n_paths: int = Field(10000, description="Число сценариев курса USD/RUB и ключевой ставки", ge=100, le=100000)
+    quantiles: List[float] = Field([0.05, 0.25, 0.5, 0.75, 0.95], description="Квантили полос прогноза", min_length=1)
+    categories: Optional[List[str]] = Field(None, description="Срез по категориям (по умолчанию все)")
+    regions: Optional[List[str]] = Field(None, description="Срез по регионам (по умолчанию все)")
+    key_rate_target: Optional[float] = Field(None, description="Долгосрочный уровень ключевой ставки (по умолчанию текущая)", ge=0)
+    seed: Optional[int] = Field(None, description="Seed генератора для воспроизводимости")
+
 class ClientRequest(BaseModel):
     recency: int = Field(30, description="Давность последней покупки (дней)", ge=1)
     frequency: int = Field(5, description="Частота покупок (в месяц)", ge=1)
@@ -46,10 +116,15 @@ class ClientRequest(BaseModel):
 class InnRequest(BaseModel):
     inn_or_query: str = Field(..., description="ИНН организации (например, 7707083893 для Альфа-Банка) или название")
 
+class InnBulkRequest(BaseModel):
+    inns: List[str] = Field(..., description="Список ИНН для пакетного обогащения и сегментации", min_length=1)
+    concurrency: int = Field(20, description="Максимум одновременных запросов к DaData", ge=1, le=200)
+    rate_limit: float = Field(20.0, description="Максимум запросов к DaData в секунду (0 — без ограничения)", ge=0)
+
 @app.get("/", tags=["Health Check"])
 async def health_check():
     """Проверка работоспособности API и поставщиков данных"""
-    cbr = macro_provider.get_cbr_rates()
+    cbr = macro_provider.get_cached_rates()
     return {
         "status": "healthy",
         "service": "Альфа-Аналитика B2B API v2.0",
@@ -61,19 +136,36 @@ async def health_check():
 @app.post("/analyze-location", tags=["Геоаналитика"])
 async def analyze_location(req: LocationRequest):
     """Оценка потенциала и выручки точки по трафику и району"""
-    return location_analyzer.predict(
-        pedestrian_traffic=req.pedestrian_traffic,
-        avg_purchase_value=req.avg_purchase_value,
-        district=req.district
-    )
+    # Lookup-table hits take microseconds; only rows the model has to score are batched
+    cached = model_registry.get("location_analyzer").predict_from_lut(req.pedestrian_traffic, req.avg_purchase_value, req.district)
+    if cached is not None:
+        return cached
+    return await location_batcher.submit({
+        "pedestrian_traffic": req.pedestrian_traffic,
+        "avg_purchase_value": req.avg_purchase_value,
+        "district": req.district
+    })
+
+@app.post("/analyze-location/batch", tags=["Геоаналитика"])
+async def analyze_location_batch(req: LocationBatchRequest):
+    """Пакетная оценка потенциала множества локаций одним вызовом модели"""
+    results = model_registry.get("location_analyzer").predict_many({
+        "pedestrian_traffic": [loc.pedestrian_traffic for loc in req.locations],
+        "avg_purchase_value": [loc.avg_purchase_value for loc in req.locations],
+        "district": [loc.district for loc in req.locations]
+    })
+    return {
+        "count": len(results),
+        "results": results.to_dict(orient="records")
+    }
 
 @app.post("/analyze-location-coords", tags=["Геоаналитика"])
 async def analyze_location_coords(req: LocationCoordsRequest):
     """Оценка потенциала локации с использованием реальных POI из OpenStreetMap"""
-    osm_data = overpass_provider.get_pois_around(req.lat, req.lon, radius=500)
+    osm_data = await overpass_provider.get_pois_around_async(req.lat, req.lon, radius=500)
     traffic = osm_data["traffic_score"]
     
-    analysis = location_analyzer.predict(
+    analysis = model_registry.get("location_analyzer").predict(
         pedestrian_traffic=traffic,
         avg_purchase_value=req.avg_purchase_value,
         district="central"
@@ -82,26 +174,135 @@ async def analyze_location_coords(req: LocationCoordsRequest):
     analysis["osm_real_data"] = osm_data
     return analysis
 
+@app.post("/optimize-sites", tags=["Геоаналитика"])
+async def optimize_sites(req: SiteOptimizationRequest):
+    """Выбор k лучших точек из кандидатов с учетом каннибализации и конкурентов (lazy greedy)"""
+    traffic = [c.pedestrian_traffic for c in req.candidates]
+    if any(t is None for t in traffic):
+        if overpass_provider.local_index is None:
+            raise HTTPException(status_code=400, detail="Укажите pedestrian_traffic для всех кандидатов или включите POI_BACKEND=local")
+        traffic = None
+        
+    optimizer = SiteOptimizer(
+        model_registry.get("location_analyzer"), traffic_source=overpass_provider.local_index,
+        decay_m=req.decay_m, cannibalization=req.cannibalization, competitor_penalty=req.competitor_penalty
+    )
+    competitors = ([c.lat for c in req.competitors], [c.lon for c in req.competitors]) if req.competitors else None
+    # CPU-bound (rasterization, batch predict, CELF): keep it off the event loop
+    return await run_in_threadpool(
+        optimizer.select,
+        [c.lat for c in req.candidates], [c.lon for c in req.candidates], req.k,
+        avg_purchase_value=req.avg_purchase_value, traffic=traffic, competitors=competitors,
+        min_distance_m=req.min_distance_m
+    )
+
+def get_revenue_heatmap(city: str):
+    heatmap = load_revenue_heatmap()
+    if heatmap is None:
+        raise HTTPException(status_code=404, detail="Тепловая карта не построена: python -m models.revenue_heatmap")
+    if city not in heatmap.grids:
+        raise HTTPException(status_code=404, detail=f"Нет тепловой карты для города '{city}'")
+    return heatmap
+
+@app.get("/heatmap/cities", tags=["Геоаналитика"])
+async def heatmap_cities():
+    """Города с предрассчитанной тепловой картой выручки и параметры расчета"""
+    heatmap = load_revenue_heatmap()
+    if heatmap is None:
+        raise HTTPException(status_code=404, detail="Тепловая карта не построена: python -m models.revenue_heatmap")
+    return {"cities": heatmap.cities(), "check_levels": heatmap.check_levels.tolist(), "meta": heatmap.meta}
+
+# Grid slicing and PNG encoding are CPU-bound: plain def so it runs in the threadpool
+@app.get("/heatmap/{city}/tiles/{z}/{x}/{y}.png", tags=["Геоаналитика"])
+def heatmap_tile(city: str, z: int, x: int, y: int, avg_check: float = Query(2500.0, ge=0)):
+    """XYZ-тайл тепловой карты прогнозной выручки для заданного среднего чека"""
+    png = get_revenue_heatmap(city).tile_png(city, avg_check, z, x, y)
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "public, max-age=3600"})
+
+@app.get("/heatmap/{city}/top-cells", tags=["Геоаналитика"])
+async def heatmap_top_cells(city: str, avg_check: float = Query(2500.0, ge=0), k: int = Query(20, ge=1, le=500)):
+    """Лучшие ячейки города по прогнозной выручке для заданного среднего чека"""
+    heatmap = get_revenue_heatmap(city)
+    return {"city": city, "avg_check": avg_check, "cells": heatmap.top_cells(city, avg_check, k)}
+
 @app.post("/forecast-demand", tags=["Прогнозирование спроса"])
 async def forecast_demand(req: DemandRequest):
     """Прогноз спроса с учетом макропоказателей ЦБ РФ и производственного календаря"""
-    return demand_forecaster.forecast(
+    forecaster = model_registry.get("demand_forecaster")
+    # Materialized for the day and CBR snapshot; only unknown categories/regions are computed live
+    stored = forecast_store.get(forecaster, req.category, req.region, req.periods)
+    if stored is not None:
+        return stored
+    return forecaster.forecast(
         category=req.category,
         region=req.region,
         months_ahead=req.periods
     )
 
+# Plain def: FastAPI runs it in the threadpool, so the tensor math and tolist() stay off the event loop
+@app.post("/forecast-demand/cube", tags=["Прогнозирование спроса"])
+def forecast_demand_cube(req: DemandCubeRequest):
+    """Прогноз спроса сразу по всем категориям × регионам × месяцам (или их срезу) одним вызовом"""
+    cube = model_registry.get("demand_forecaster").forecast_cube(
+        months_ahead=req.periods,
+        categories=req.categories,
+        regions=req.regions
+    )
+    # Arrays are (categories, regions, months); averages are (categories, regions)
+    return {key: value.tolist() if hasattr(value, "tolist") else value for key, value in cube.items()}
+
+# Monte Carlo over n_paths x months is CPU-bound: plain def so it runs in the threadpool
+@app.post("/forecast-demand/scenarios", tags=["Прогнозирование спроса"])
+def forecast_demand_scenarios(req: DemandScenarioRequest):
+    """Monte Carlo сценарии курса USD/RUB и ключевой ставки: квантильные полосы спроса по месяцам"""
+    if any(not 0 <= q <= 1 for q in req.quantiles):
+        raise HTTPException(status_code=400, detail="Квантили должны лежать в диапазоне [0, 1]")
+    scenarios = model_registry.get("demand_forecaster").forecast_scenarios(
+        months_ahead=req.periods,
+        n_paths=req.n_paths,
+        quantiles=req.quantiles,
+        categories=req.categories,
+        regions=req.regions,
+        key_rate_target=req.key_rate_target,
+        seed=req.seed
+    )
+    # volume_quantiles is (quantiles, categories, regions, months)
+    return {key: value.tolist() if hasattr(value, "tolist") else value for key, value in scenarios.items()}
+
 @app.post("/segment-client", tags=["Сегментация B2B"])
 async def segment_client(req: ClientRequest):
     """Сегментация клиента по RFM метрикам"""
-    return client_segmenter.segment_by_metrics(
-        recency=req.recency,
-        frequency=req.frequency,
-        monetary=req.monetary,
-        company_size=req.company_size
-    )
+    return await segment_batcher.submit({
+        "recency": req.recency,
+        "frequency": req.frequency,
+        "monetary": req.monetary,
+        "company_size": req.company_size
+    })
 
 @app.post("/segment-client-inn", tags=["Сегментация B2B"])
 async def segment_client_inn(req: InnRequest):
     """Автоматическая обогащенная сегментация по ИНН компании через DaData API"""
-    return client_segmenter.segment_by_inn(req.inn_or_query)
\ No newline at end of file
+    return await model_registry.get("client_segmenter").segment_by_inn_async(req.inn_or_query)
+
+@app.post("/segment-client-inn/bulk", tags=["Сегментация B2B"])
+async def segment_client_inn_bulk(req: InnBulkRequest):
+    """Пакетная сегментация портфеля ИНН с потоковой выдачей результатов (NDJSON) по мере готовности"""
+    async def ndjson_lines():
+        async for res in model_registry.get("client_segmenter").segment_many_by_inn_async(
+            req.inns, concurrency=req.concurrency, rate_limit=req.rate_limit
+        ):
+            yield json.dumps(res, ensure_ascii=False) + "\n"
+            
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.get("/models/status", tags=["Health Check"])
+async def models_status():
+    """Версии загруженных моделей и статистика микро-батчинга"""
+    return {
+        "models": model_registry.versions(),
+        "forecast_store": forecast_store.info(),
+        "micro_batching": {
+            "analyze_location": location_batcher.stats(),
+            "segment_client": segment_batcher.stats()
+        }
+    }
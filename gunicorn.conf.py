@@ -0,0 +1,21 @@
+# Shared-memory deployment of the API:
+#   gunicorn -c gunicorn.conf.py api.main:app
+# The master imports the app and loads every model once (ALFA_PRELOAD_MODELS=1),
+# then forks the uvicorn workers, which share those pages copy-on-write.
+# Set ALFA_PRELOAD_MODELS=0 to let each worker load its own copy instead.
+import gc
+import os
+
+os.environ.setdefault("ALFA_PRELOAD_MODELS", "1")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ["ALFA_PRELOAD_MODELS"] == "1"
+timeout = 60
+
+def when_ready(server):
+    # Move the preloaded heap to the permanent generation so the cyclic GC in
+    # workers does not write to (and thereby copy) the shared model pages
+    gc.collect()
+    gc.freeze()
@@ -5,6 +5,7 @@ from sklearn.preprocessing import PowerTransformer, StandardScaler
 from sklearn.metrics import silhouette_score, calinski_harabasz_score, davies_bouldin_score
 import joblib
 
+from models.gmm_scorer import GMMScorer
 from utils.dadata_provider import DaDataClient
 
 class ClientSegmenter:
@@ -12,6 +13,9 @@ class ClientSegmenter:
     
     def __init__(self):
         self.model = None
+        self.model_version = None
+        # Compiled NumPy copy of transformer + model, rebuilt on train/load
+        self.scorer = None
         self.transformer = PowerTransformer(method='yeo-johnson')
         self.dadata_client = DaDataClient()
         self.n_clusters = 4
@@ -33,6 +37,7 @@ class ClientSegmenter:
         cluster_preds = gmm.fit_predict(X_trans)
         
         self.model = gmm
+        self.scorer = GMMScorer.from_sklearn(self.transformer, gmm)
         
         # Evaluate clustering metrics
         sil_score = silhouette_score(X_trans, cluster_preds)
@@ -45,7 +50,29 @@ class ClientSegmenter:
     def segment_by_inn(self, inn_or_name: str) -> dict:
         """Enrich company data live via DaData API by INN and assign B2B cluster with confidence."""
         dadata_res = self.dadata_client.get_company_by_inn(inn_or_name)
-        
+        return self._segment_enriched(dadata_res)
+
+    async def segment_by_inn_async(self, inn_or_name: str) -> dict:
+        """Non-blocking variant of segment_by_inn for async API handlers."""
+        dadata_res = await self.dadata_client.get_company_by_inn_async(inn_or_name)
+        return self._segment_enriched(dadata_res)
+
+    def segment_many_by_inn(self, inns, **kwargs):
+        """Enrich and segment many INNs concurrently, yielding results as they complete.
+
+        Keyword arguments (concurrency, rate_limit, max_retries, backoff_seconds)
+        are passed to ``DaDataClient.iter_companies_by_inn``.
+        """
+        for dadata_res in self.dadata_client.iter_companies_by_inn(inns, **kwargs):
+            yield self._segment_enriched(dadata_res)
+
+    async def segment_many_by_inn_async(self, inns, **kwargs):
+        """Async generator variant of segment_many_by_inn for streaming API responses."""
+        async for dadata_res in self.dadata_client.iter_companies_by_inn_async(inns, **kwargs):
+            yield self._segment_enriched(dadata_res)
+
+    def _segment_enriched(self, dadata_res: dict) -> dict:
+        """Assign B2B cluster to a DaData enrichment result."""
         revenue = dadata_res["revenue"]
         employees = dadata_res["employee_count"]
         company_age = dadata_res["company_age_years"]
@@ -66,8 +93,8 @@ class ClientSegmenter:
             "status": dadata_res["status"],
             "inn": dadata_res["inn"],
             "company_name": dadata_res["name"],
-            "short_name": dadata_res["short_name"],
-            "address": dadata_res["address"],
+            "short_name": dadata_res.get("short_name", ""),
+            "address": dadata_res.get("address", ""),
             "okved": dadata_res["okved"],
             "employee_count": employees,
             "official_revenue_rub": revenue,
@@ -81,42 +108,73 @@ class ClientSegmenter:
 
     def segment_by_metrics(self, recency: int, frequency: int, monetary: float, company_size: int = 10) -> dict:
         """Segment manual RFM metrics."""
-        features = pd.DataFrame([{
-            'recency': recency,
-            'frequency': frequency,
-            'monetary': monetary,
-            'company_size': company_size
-        }])
+        if self.scorer is not None:
+            # Single-row fast path: skips DataFrame construction, same record as segment_many_by_metrics
+            cluster_ids, confidence = self.scorer.predict([[recency, frequency, monetary, company_size]])
+            cluster_id = int(cluster_ids[0])
+            cluster_info = self.cluster_labels[cluster_id]
+            return {
+                "recency_days": recency,
+                "frequency_orders": frequency,
+                "monetary_turnover_rub": float(monetary),
+                "segment_id": cluster_id,
+                "segment_name": cluster_info["name"],
+                "risk_level": cluster_info["risk"],
+                "recommended_action": cluster_info["action"],
+                "clustering_confidence": round(float(confidence[0]), 4)
+            }
+        return self.segment_many_by_metrics({
+            'recency': [recency],
+            'frequency': [frequency],
+            'monetary': [monetary],
+            'company_size': [company_size]
+        }).to_dict(orient="records")[0]
+
+    def segment_many_by_metrics(self, data) -> pd.DataFrame:
+        """Segment many clients with one vectorized posterior computation.
+
+        ``data`` is a DataFrame or mapping of columns ``recency``, ``frequency``,
+        ``monetary`` and optional ``company_size``.
+        """
+        features = pd.DataFrame(data)
+        if 'company_size' not in features.columns:
+            features['company_size'] = 10
+        features = features[['recency', 'frequency', 'monetary', 'company_size']]
+        monetary = features['monetary'].to_numpy(dtype=float)
         
-        if self.model is not None:
-            feat_trans = self.transformer.transform(features)
-            cluster_id = int(self.model.predict(feat_trans)[0])
+        if len(features) == 0:
+            cluster_ids = np.empty(0, dtype=int)
+            confidence = np.empty(0)
+        elif self.scorer is not None:
+            # Columns are matched positionally with the ones the transformer was fitted on
+            cluster_ids, confidence = self.scorer.predict(features.to_numpy(dtype=float))
+            confidence = np.round(confidence, 4)
         else:
-            if monetary > 10000000:
-                cluster_id = 0
-            elif monetary > 2000000:
-                cluster_id = 1
-            elif monetary > 300000:
-                cluster_id = 2
-            else:
-                cluster_id = 3
-                
-        cluster_info = self.cluster_labels[cluster_id]
-        return {
-            "recency_days": recency,
-            "frequency_orders": frequency,
+            cluster_ids = np.select(
+                [monetary > 10000000, monetary > 2000000, monetary > 300000], [0, 1, 2], default=3
+            )
+            confidence = np.full(len(features), 0.91)
+            
+        names = np.array([self.cluster_labels[i]["name"] for i in range(self.n_clusters)], dtype=object)
+        risks = np.array([self.cluster_labels[i]["risk"] for i in range(self.n_clusters)], dtype=object)
+        actions = np.array([self.cluster_labels[i]["action"] for i in range(self.n_clusters)], dtype=object)
+        
+        return pd.DataFrame({
+            "recency_days": features['recency'].to_numpy(),
+            "frequency_orders": features['frequency'].to_numpy(),
             "monetary_turnover_rub": monetary,
-            "segment_id": cluster_id,
-            "segment_name": cluster_info["name"],
-            "risk_level": cluster_info["risk"],
-            "recommended_action": cluster_info["action"],
-            "clustering_confidence": 0.91
-        }
+            "segment_id": cluster_ids,
+            "segment_name": names[cluster_ids],
+            "risk_level": risks[cluster_ids],
+            "recommended_action": actions[cluster_ids],
+            "clustering_confidence": confidence
+        })
 
     def save(self, filepath: str):
         joblib.dump({"model": self.model, "transformer": self.transformer}, filepath)
 
-    def load(self, filepath: str):
-        data = joblib.load(filepath)
+    def load(self, filepath: str, mmap_mode: str = None):
+        data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = data["model"]
-        self.transformer = data["transformer"]
\ No newline at end of file
+        self.transformer = data["transformer"]
+        self.scorer = GMMScorer.from_sklearn(self.transformer, self.model) if self.model is not None else None
\ No newline at end of file
@@ -0,0 +1,180 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from models.demand_forecaster import DEMAND_FEATURES, DemandForecaster, build_lag_features
+
+# Forecast origins as a share of each series; fold i is evaluated on [origin_i, origin_i + window)
+DEMAND_BACKTEST_ORIGINS = (0.6, 0.7, 0.8, 0.9)
+DEMAND_BACKTEST_WINDOW = 0.1
+# Trees per fold model when the forecaster has no trained size for the category
+DEMAND_BACKTEST_TREES = 200
+# Target share of actuals inside the forecast band; the calibrated margin is this quantile of |actual / predicted - 1|
+DEMAND_BAND_COVERAGE = 0.9
+
+# Per-process views of the shared matrices, set by _attach
+_shared = {}
+
+
+def _share(arrays: dict):
+    """Copy arrays into shared memory blocks once; returns the blocks and a picklable spec for workers."""
+    blocks, spec = [], {}
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        spec[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, spec
+
+
+def _attach(spec: dict):
+    """Worker initializer: map the shared matrices without copying them."""
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        # Keep the mapping alive for the worker's lifetime
+        _shared[f"_{name}_block"] = block
+
+
+def _run_fold(category_code: int, origin: float, n_trees: int, margin: float, n_threads: int) -> dict:
+    """Fit on records before ``origin`` and score one-step-ahead forecasts in the following window."""
+    import lightgbm as lgb
+
+    started = time.perf_counter()
+    X, y, position = _shared["X"], _shared["y"], _shared["position"]
+    series, category = _shared["series"], _shared["category"]
+    in_category = category == category_code
+    train = in_category & (position < origin)
+    test = in_category & (position >= origin) & (position < origin + DEMAND_BACKTEST_WINDOW)
+
+    model = lgb.LGBMRegressor(
+        n_estimators=n_trees,
+        learning_rate=0.05,
+        num_leaves=31,
+        min_child_samples=50,
+        n_jobs=n_threads,
+        random_state=42,
+        verbose=-1
+    )
+    model.fit(X[train], y[train])
+    actual = np.expm1(y[test])
+    predicted = np.expm1(model.predict(X[test]))
+
+    # Per-series sums, so folds can be merged exactly
+    ids = series[test]
+    n_series = int(series.max()) + 1
+    abs_err = np.abs(actual - predicted)
+    covered = (actual >= predicted * (1 - margin)) & (actual <= predicted * (1 + margin))
+    # The band is relative to the prediction, so this is the margin each actual needs to be covered
+    band_dev = abs_err / np.maximum(np.abs(predicted), 1.0)
+    return {
+        "category_code": category_code,
+        "origin": origin,
+        "n": np.bincount(ids, minlength=n_series),
+        "abs_err": np.bincount(ids, weights=abs_err, minlength=n_series),
+        "ape": np.bincount(ids, weights=abs_err / np.maximum(np.abs(actual), 1.0), minlength=n_series),
+        "covered": np.bincount(ids, weights=covered, minlength=n_series),
+        "band_dev": band_dev.astype(np.float32),
+        "n_train": int(train.sum()),
+        "n_test": int(test.sum()),
+        "wall_seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def run_backtest(df: pd.DataFrame, forecaster=None, origins=DEMAND_BACKTEST_ORIGINS, n_workers: int = None) -> dict:
+    """Rolling-origin backtest of the demand model over every (category, region) series.
+
+    Features are built once and placed in shared memory; worker processes
+    attach to it and each fits one (category, origin) fold. Forecasts are
+    one step ahead with observed lags, the same setting the model is trained
+    for. Coverage is the share of actuals inside the forecaster's
+    ``bound_margin`` band the forecaster had when the backtest ran. Each
+    category also gets ``bound_margin``: the ``DEMAND_BAND_COVERAGE``
+    quantile of the relative deviation from the forecast, which
+    ``DemandForecaster.bound_margin`` uses once the report is attached, and
+    ``calibrated_coverage``, the share of actuals inside that band. Returns
+    per-series and per-category MAPE, MAE and coverage, plus the wall time
+    of every fold.
+    """
+    started = time.perf_counter()
+    forecaster = forecaster or DemandForecaster()
+    frame, _ = build_lag_features(df, forecaster.regions)
+    frame = frame.dropna(subset=list(DEMAND_FEATURES)).reset_index(drop=True)
+    categories = sorted(frame["category"].unique())
+    series_keys = frame[["category", "region"]].drop_duplicates().reset_index(drop=True)
+    series_id = frame.merge(series_keys.reset_index(), on=["category", "region"], how="left")["index"].to_numpy()
+
+    blocks, spec = _share({
+        "X": frame[list(DEMAND_FEATURES)].to_numpy(dtype=np.float32),
+        "y": frame["target"].to_numpy(dtype=np.float64),
+        "position": frame["position"].to_numpy(dtype=np.float64),
+        "series": series_id.astype(np.int64),
+        "category": pd.Categorical(frame["category"], categories=categories).codes.astype(np.int64)
+    })
+    try:
+        cores = os.cpu_count() or 1
+        tasks = [(code, origin) for code in range(len(categories)) for origin in origins]
+        n_workers = n_workers or min(len(tasks), cores)
+        n_threads = max(1, cores // n_workers)
+        jobs = [(
+            code, origin,
+            forecaster.metrics.get(categories[code], {}).get("n_trees", DEMAND_BACKTEST_TREES),
+            forecaster.bound_margin(categories[code]),
+            n_threads
+        ) for code, origin in tasks]
+        if n_workers == 1:
+            _shared.update({name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+                            for block, (name, (_, shape, dtype)) in zip(blocks, spec.items())})
+            folds = [_run_fold(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_attach, initargs=(spec,)) as pool:
+                folds = list(pool.map(_run_fold, *zip(*jobs)))
+    finally:
+        _shared.clear()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    totals = {key: sum(fold[key] for fold in folds) for key in ("n", "abs_err", "ape", "covered")}
+    per_series = series_keys.assign(
+        n=totals["n"], mape=totals["ape"] / np.maximum(totals["n"], 1),
+        mae=totals["abs_err"] / np.maximum(totals["n"], 1), coverage=totals["covered"] / np.maximum(totals["n"], 1)
+    )
+    per_category = {}
+    for code, category in enumerate(categories):
+        mask = (series_keys["category"] == category).to_numpy()
+        n = totals["n"][mask].sum()
+        band_dev = np.concatenate([fold["band_dev"] for fold in folds if fold["category_code"] == code])
+        bound_margin = float(np.quantile(band_dev, DEMAND_BAND_COVERAGE)) if len(band_dev) else None
+        per_category[category] = {
+            "n": int(n),
+            "mape": float(totals["ape"][mask].sum() / max(n, 1)),
+            "mae": float(totals["abs_err"][mask].sum() / max(n, 1)),
+            "coverage": float(totals["covered"][mask].sum() / max(n, 1)),
+            "bound_margin": bound_margin,
+            "calibrated_coverage": float(np.mean(band_dev <= bound_margin)) if len(band_dev) else None
+        }
+    n = totals["n"].sum()
+    return {
+        "origins": list(origins),
+        "window": DEMAND_BACKTEST_WINDOW,
+        "mape": float(totals["ape"].sum() / max(n, 1)),
+        "mae": float(totals["abs_err"].sum() / max(n, 1)),
+        "coverage": float(totals["covered"].sum() / max(n, 1)),
+        "band_coverage_target": DEMAND_BAND_COVERAGE,
+        "categories": per_category,
+        "series": per_series.to_dict(orient="records"),
+        "folds": [{
+            "category": categories[fold["category_code"]],
+            "origin": fold["origin"],
+            "n_train": fold["n_train"],
+            "n_test": fold["n_test"],
+            "wall_seconds": fold["wall_seconds"]
+        } for fold in folds],
+        "workers": n_workers,
+        "wall_seconds": round(time.perf_counter() - started, 2)
+    }
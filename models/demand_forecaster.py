@@ -1,19 +1,161 @@
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.metrics import mean_absolute_percentage_error, mean_absolute_error, mean_squared_error
 import joblib
+import os
+import time
 
 from utils.macro_provider import MacroDataProvider
 
+DEMAND_LAGS = (1, 2, 3, 6, 12)
+DEMAND_WINDOWS = (3, 6, 12)
+DEMAND_FEATURES = (["month", "region_code"] + [f"lag_{lag}" for lag in DEMAND_LAGS]
+                   + [f"rolling_mean_{w}" for w in DEMAND_WINDOWS] + ["rolling_std_12"])
+# Share of each series (its latest records) held out for early stopping and metrics
+DEMAND_HOLDOUT = 0.2
+# A learned profile flatter than this (max - min factor) carries no seasonal signal
+DEMAND_MIN_SEASONAL_AMPLITUDE = 0.05
+# Latest log-demand values kept per series as rollout input: covers every lag and window
+DEMAND_HISTORY_DEPTH = max(max(DEMAND_LAGS), max(DEMAND_WINDOWS))
+# The rollout reaches this many months past the current one; forecasts beyond it extend it on demand
+DEMAND_ROLLOUT_MONTHS = 36
+
+# Import-heavy categories respond to the ruble: +0.3% demand per RUB of USD/RUB above 80
+MACRO_SENSITIVE_CATEGORIES = ('electronics', 'clothing')
+USD_RUB_NEUTRAL = 80.0
+USD_RUB_SENSITIVITY = 0.003
+# ...and to credit costs: demand change per p.p. of key rate above today's (scenario mode only)
+KEY_RATE_SENSITIVITY = -0.01
+
+# Monte Carlo macro scenarios: monthly steps, USD/RUB as a lognormal walk and
+# the key rate as a mean-reverting process, with correlated shocks
+SCENARIO_PATHS = 10000
+SCENARIO_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+SCENARIO_FX_VOL = 0.15
+SCENARIO_RATE_VOL = 0.75
+SCENARIO_RATE_REVERSION = 0.08
+SCENARIO_FX_RATE_CORR = 0.4
+
+
+def build_lag_features(df: pd.DataFrame, regions: list = None):
+    """Lag and rolling features over log1p(total_volume) for every (category, region) series.
+
+    ``df`` is the flattened frame from ``load_and_preprocess_demand_data``.
+    Records are ordered by period within each series; rolling windows only
+    see values before the current record. Returns the sorted frame (with
+    ``target``, ``holdout`` and feature columns) and the region order behind
+    ``region_code``.
+    """
+    regions = regions or sorted(df["region"].unique())
+    df = df.sort_values(["category", "region", "period_date"], kind="stable").reset_index(drop=True)
+    df["target"] = np.log1p(df["total_volume"].astype(float))
+    series = df.groupby(["category", "region"], sort=False)["target"]
+    df["month"] = df["period_date"].dt.month
+    df["region_code"] = pd.Categorical(df["region"], categories=regions).codes
+    for lag in DEMAND_LAGS:
+        df[f"lag_{lag}"] = series.shift(lag)
+    for w in DEMAND_WINDOWS:
+        df[f"rolling_mean_{w}"] = series.transform(lambda s: s.shift(1).rolling(w).mean())
+    df["rolling_std_12"] = series.transform(lambda s: s.shift(1).rolling(12).std())
+    # Relative position of each record within its series, 0 = oldest
+    df["position"] = series.cumcount() / series.transform("size")
+    df["holdout"] = df["position"] >= 1 - DEMAND_HOLDOUT
+    return df, regions
+
+
+def simulate_macro_paths(usd_rub: float, key_rate: float, months: int, n_paths: int = SCENARIO_PATHS,
+                         key_rate_target: float = None, seed: int = None):
+    """Monthly USD/RUB and key-rate paths, each of shape (n_paths, months).
+
+    USD/RUB follows a driftless lognormal walk with ``SCENARIO_FX_VOL``
+    annual volatility; the key rate reverts toward ``key_rate_target``
+    (today's rate by default) and is floored at zero. Shocks are correlated,
+    so a weaker ruble tends to come with a higher rate.
+    """
+    rng = np.random.default_rng(seed)
+    shocks = rng.standard_normal((2, n_paths, months))
+    fx_shock = shocks[0]
+    rate_shock = SCENARIO_FX_RATE_CORR * fx_shock + np.sqrt(1 - SCENARIO_FX_RATE_CORR ** 2) * shocks[1]
+
+    fx_vol = SCENARIO_FX_VOL / np.sqrt(12)
+    usd = usd_rub * np.exp(np.cumsum(fx_vol * fx_shock - 0.5 * fx_vol ** 2, axis=1))
+
+    target = key_rate if key_rate_target is None else key_rate_target
+    rates = np.empty((n_paths, months))
+    rate = np.full(n_paths, float(key_rate))
+    for t in range(months):
+        rate = np.maximum(rate + SCENARIO_RATE_REVERSION * (target - rate) + SCENARIO_RATE_VOL * rate_shock[:, t], 0.0)
+        rates[:, t] = rate
+    return usd, rates
+
+
+def _path_quantiles(paths: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Per-month quantiles of (n_paths, months) paths; same as ``np.quantile(..., axis=0)``.
+
+    A full sort along the path axis is several times faster here than the
+    multi-kth partition ``np.quantile`` uses.
+    """
+    ordered = np.sort(paths, axis=0)
+    pos = q * (len(ordered) - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, len(ordered) - 1)
+    w = (pos - lo)[:, None]
+    return ordered[lo] * (1 - w) + ordered[hi] * w
+
+
+def _fit_category(category: str, X: np.ndarray, y: np.ndarray, holdout: np.ndarray, n_threads: int):
+    """Process-pool worker: fit one category's LightGBM model with early stopping on its holdout."""
+    import lightgbm as lgb
+
+    started = time.perf_counter()
+    model = lgb.LGBMRegressor(
+        n_estimators=1000,
+        learning_rate=0.05,
+        num_leaves=31,
+        min_child_samples=50,
+        n_jobs=n_threads,
+        random_state=42,
+        verbose=-1
+    )
+    model.fit(
+        X[~holdout], y[~holdout],
+        eval_set=[(X[holdout], y[holdout])],
+        callbacks=[lgb.early_stopping(20, verbose=False)]
+    )
+    y_true = np.expm1(y[holdout])
+    y_pred = np.expm1(model.predict(X[holdout]))
+    n_trees = max(1, int(model.best_iteration_ or model.n_estimators))
+    # The holdout is the latest stretch of every series; refit on everything so the final model has seen it
+    model.set_params(n_estimators=n_trees)
+    model.fit(X, y)
+    return category, model, {
+        "n_rows": int(len(y)),
+        "n_trees": n_trees,
+        "mape": float(mean_absolute_percentage_error(y_true, y_pred)),
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "train_seconds": round(time.perf_counter() - started, 2)
+    }
+
+
 class DemandForecaster:
     """Hybrid Demand Forecasting model with 100% visually distinct category profiles."""
     
     def __init__(self):
         self.model = None
+        self.model_version = None
         self.macro_provider = MacroDataProvider()
         self.feature_names = None
+        self.regions = None
+        self.learned_seasonality = {}
+        self.metrics = {}
+        self.backtest = {}
+        # Per category: latest history of every (category, region) series, see _series_history
+        self.history = {}
+        # (last month covered, {category: (first month, region -> row, (series, months) volumes)})
+        self._rollout = None
         
         # 6 Radically Different Visual Shapes per category (Months 1..12)
         self.category_seasonality = {
@@ -55,16 +197,8 @@ class DemandForecaster:
             'свердловская обл.': {'base_mult': 1.00, 'growth_trend': 0.012},
             'амурская обл.': {'base_mult': 0.75, 'growth_trend': 0.010}
         }
-
-    def forecast(self, category: str, region: str, months_ahead: int = 12) -> dict:
-        """Generate 100% visually distinct category demand forecast curves."""
-        cbr_rates = self.macro_provider.get_cbr_rates()
-        usd_rub = cbr_rates["usd_rub"]
         
-        cat_key = category.lower().strip()
-        reg_key = region.lower().strip()
-        
-        base_volumes = {
+        self.base_volumes = {
             'electronics': 15000,
             'pharmacy': 18000,
             'beauty': 12000,
@@ -72,28 +206,47 @@ class DemandForecaster:
             'groceries': 45000,
             'household': 16000
         }
+
+    def forecast(self, category: str, region: str, months_ahead: int = 12, cbr_rates: dict = None) -> dict:
+        """Generate 100% visually distinct category demand forecast curves.
+
+        Series the trained models know are served from their rolled-out
+        predictions (level and shape); other pairs, or all of them when no
+        model is loaded, come from the curated tables. Pass ``cbr_rates`` to
+        pin a specific CBR snapshot; by default the process-wide cached one is used.
+        """
+        if cbr_rates is None:
+            cbr_rates = self.macro_provider.get_cached_rates()
+        usd_rub = cbr_rates["usd_rub"]
         
-        base_vol = base_volumes.get(cat_key, 20000)
-        seasonality_profile = self.category_seasonality.get(cat_key, self.category_seasonality['electronics'])
+        cat_key = category.lower().strip()
+        reg_key = region.lower().strip()
+        
+        base_vol = self.base_volumes.get(cat_key, 20000)
+        seasonality_profile = self._seasonality_profile(cat_key)
         region_profile = self.region_profiles.get(reg_key, {'base_mult': 1.0, 'growth_trend': 0.015})
         
         monthly_forecasts = []
         today = datetime.now()
+        target_dates = [today + timedelta(days=30 * i) for i in range(1, months_ahead + 1)]
+        model_volumes = self._model_volumes([cat_key], [reg_key], target_dates)[0, 0]
         
-        for i in range(1, months_ahead + 1):
-            target_date = today + timedelta(days=30 * i)
+        for i, target_date in enumerate(target_dates, start=1):
             month_num = target_date.month
             
             seasonal_mult = seasonality_profile.get(month_num, 1.0)
             reg_mult = region_profile['base_mult']
             growth_factor = 1.0 + (i * region_profile['growth_trend'])
             
-            macro_mult = 1.0 + ((usd_rub - 80.0) * 0.003) if cat_key in ['electronics', 'clothing'] else 1.0
+            macro_mult = 1.0 + ((usd_rub - USD_RUB_NEUTRAL) * USD_RUB_SENSITIVITY) if cat_key in MACRO_SENSITIVE_CATEGORIES else 1.0
             
-            pred_demand = base_vol * seasonal_mult * reg_mult * growth_factor * macro_mult
+            if np.isfinite(model_volumes[i - 1]):
+                pred_demand = float(model_volumes[i - 1]) * macro_mult
+            else:
+                pred_demand = base_vol * seasonal_mult * reg_mult * growth_factor * macro_mult
             
-            bound_margin = 0.08 if cat_key == 'groceries' else 0.14
-            lower_bound = pred_demand * (1.0 - bound_margin)
+            bound_margin = self.bound_margin(cat_key)
+            lower_bound = max(pred_demand * (1.0 - bound_margin), 0.0)
             upper_bound = pred_demand * (1.0 + bound_margin)
             
             monthly_forecasts.append({
@@ -117,12 +270,339 @@ class DemandForecaster:
                 "cbr_key_rate": cbr_rates["key_rate_cbr"]
             },
             "monthly_forecasts": monthly_forecasts,
-            "accuracy_mape_percent": "6.4%" if cat_key == "groceries" else "8.2%"
+            "accuracy_mape_percent": self.accuracy_mape(cat_key)
+        }
+
+    def bound_margin(self, category: str) -> float:
+        """Relative half-width of the forecast band.
+
+        Calibrated from the attached backtest (its ``DEMAND_BAND_COVERAGE``
+        quantile of relative forecast error) when there is one for the
+        category; otherwise the uncalibrated reference width.
+        """
+        calibrated = self.backtest.get("categories", {}).get(category.lower().strip(), {}).get("bound_margin")
+        if calibrated is not None:
+            return float(calibrated)
+        return 0.08 if category == 'groceries' else 0.14
+
+    def accuracy_mape(self, category: str) -> str:
+        """Backtested MAPE of the category if a backtest report is attached, else the reference figure."""
+        cat_key = category.lower().strip()
+        if cat_key in self.backtest.get("categories", {}):
+            return f"{self.backtest['categories'][cat_key]['mape'] * 100:.1f}%"
+        return "6.4%" if cat_key == "groceries" else "8.2%"
+
+    def _seasonality_profile(self, cat_key: str) -> dict:
+        """Monthly factors reported with a forecast: the learned profile where a model serves the category."""
+        if cat_key in self.history and cat_key in self.learned_seasonality:
+            return self.learned_seasonality[cat_key]
+        return self.category_seasonality.get(cat_key, self.category_seasonality['electronics'])
+
+    def _demand_tensor(self, months_ahead: int, categories: list = None, regions: list = None):
+        """Keys, target dates, (C, H) seasonality and (C, R, H) demand before the macro multiplier.
+
+        Model volumes fill every (category, region, month) a trained series
+        covers; the table formula fills the rest.
+        """
+        default_regions = [*self.region_profiles, *(r for series in self.history.values() for r in series["regions"])]
+        cat_keys = [c.lower().strip() for c in (categories or dict.fromkeys([*self.category_seasonality, *self.history]))]
+        reg_keys = [r.lower().strip() for r in (regions or dict.fromkeys(default_regions))]
+        
+        today = datetime.now()
+        horizon = np.arange(1, months_ahead + 1)
+        target_dates = [today + timedelta(days=30 * int(i)) for i in horizon]
+        month_idx = np.array([d.month for d in target_dates]) - 1
+        
+        seasonality = np.array([
+            [self.category_seasonality.get(c, self.category_seasonality['electronics']).get(m, 1.0) for m in range(1, 13)]
+            for c in cat_keys
+        ])[:, month_idx]
+        reported = np.array([[self._seasonality_profile(c).get(m, 1.0) for m in range(1, 13)] for c in cat_keys])[:, month_idx]
+        base_vol = np.array([self.base_volumes.get(c, 20000) for c in cat_keys], dtype=float)
+        region_profiles = [self.region_profiles.get(r, {'base_mult': 1.0, 'growth_trend': 0.015}) for r in reg_keys]
+        reg_mult = np.array([p['base_mult'] for p in region_profiles])
+        growth_factor = 1.0 + horizon[None, :] * np.array([p['growth_trend'] for p in region_profiles])[:, None]
+        
+        # (C, 1, 1) * (C, 1, H) * (1, R, 1) * (1, R, H)
+        demand = (base_vol[:, None, None] * seasonality[:, None, :] * reg_mult[None, :, None]
+                  * growth_factor[None, :, :])
+        model_volumes = self._model_volumes(cat_keys, reg_keys, target_dates)
+        demand = np.where(np.isfinite(model_volumes), model_volumes, demand)
+        return cat_keys, reg_keys, target_dates, reported, demand
+
+    def forecast_cube(self, months_ahead: int = 12, categories: list = None, regions: list = None, cbr_rates: dict = None) -> dict:
+        """Forecast every (category, region, month) at once as (categories, regions, months) arrays.
+
+        Same numbers as ``forecast`` for each pair, but seasonality, region
+        multiplier, growth and macro multiplier are broadcast over the whole
+        tensor instead of looping month by month. Defaults to all known
+        categories and regions, including every trained series; unknown keys
+        get the same defaults as ``forecast``.
+        """
+        if cbr_rates is None:
+            cbr_rates = self.macro_provider.get_cached_rates()
+        usd_rub = cbr_rates["usd_rub"]
+        
+        cat_keys, reg_keys, target_dates, seasonality, demand = self._demand_tensor(months_ahead, categories, regions)
+        macro_mult = np.array([
+            1.0 + ((usd_rub - USD_RUB_NEUTRAL) * USD_RUB_SENSITIVITY) if c in MACRO_SENSITIVE_CATEGORIES else 1.0
+            for c in cat_keys
+        ])
+        bound_margin = np.array([self.bound_margin(c) for c in cat_keys])
+        pred_demand = demand * macro_mult[:, None, None]
+        margin = bound_margin[:, None, None]
+        
+        return {
+            "categories": cat_keys,
+            "regions": reg_keys,
+            "months": [d.strftime("%Y-%m") for d in target_dates],
+            "predicted_volume": np.round(pred_demand, 0),
+            "lower_bound": np.round(np.maximum(pred_demand * (1.0 - margin), 0.0), 0),
+            "upper_bound": np.round(pred_demand * (1.0 + margin), 0),
+            "seasonal_factor": np.round(seasonality, 2),
+            "average_monthly_demand": np.round(np.round(pred_demand, 0).mean(axis=2), 0),
+            "macro_context": {
+                "usd_rub": usd_rub,
+                "cny_rub": cbr_rates["cny_rub"],
+                "cbr_key_rate": cbr_rates["key_rate_cbr"]
+            }
         }
 
+    def forecast_scenarios(self, months_ahead: int = 24, n_paths: int = SCENARIO_PATHS, quantiles=SCENARIO_QUANTILES,
+                           categories: list = None, regions: list = None, cbr_rates: dict = None,
+                           key_rate_target: float = None, seed: int = None) -> dict:
+        """Monte Carlo macro scenarios: demand quantile bands per (category, region, month).
+
+        Simulates ``n_paths`` USD/RUB and key-rate paths from today's CBR
+        snapshot and pushes them through the macro sensitivity of
+        ``MACRO_SENSITIVE_CATEGORIES``. The macro multiplier is the only
+        stochastic factor and demand is increasing in it, so quantiles are
+        taken once over the (paths, months) multiplier and broadcast onto the
+        demand tensor. Other categories have degenerate bands. The bands
+        reflect macro uncertainty only, not model error.
+        """
+        started = time.perf_counter()
+        if cbr_rates is None:
+            cbr_rates = self.macro_provider.get_cached_rates()
+        usd_rub, key_rate = cbr_rates["usd_rub"], cbr_rates["key_rate_cbr"]
+        
+        cat_keys, reg_keys, target_dates, _, demand = self._demand_tensor(months_ahead, categories, regions)
+        usd_paths, rate_paths = simulate_macro_paths(usd_rub, key_rate, months_ahead, n_paths, key_rate_target, seed)
+        macro_paths = (1.0 + (usd_paths - USD_RUB_NEUTRAL) * USD_RUB_SENSITIVITY
+                       + (rate_paths - key_rate) * KEY_RATE_SENSITIVITY)
+        q = np.asarray(quantiles, dtype=float)
+        # (Q, H) quantiles of each simulated series
+        macro_q = _path_quantiles(np.maximum(macro_paths, 0.0), q)
+        sensitive = np.array([c in MACRO_SENSITIVE_CATEGORIES for c in cat_keys])
+        # (Q, C, 1, H): the macro quantile for sensitive categories, 1 elsewhere
+        mult_q = np.where(sensitive[None, :, None, None], macro_q[:, None, None, :], 1.0)
+        point_mult = np.where(sensitive, 1.0 + (usd_rub - USD_RUB_NEUTRAL) * USD_RUB_SENSITIVITY, 1.0)
+        
+        return {
+            "categories": cat_keys,
+            "regions": reg_keys,
+            "months": [d.strftime("%Y-%m") for d in target_dates],
+            "quantiles": q.tolist(),
+            "n_paths": n_paths,
+            "predicted_volume": np.round(demand * point_mult[:, None, None], 0),
+            "volume_quantiles": np.round(demand[None] * mult_q, 0),
+            "usd_rub_quantiles": np.round(_path_quantiles(usd_paths, q), 2),
+            "key_rate_quantiles": np.round(_path_quantiles(rate_paths, q), 2),
+            "macro_context": {
+                "usd_rub": usd_rub,
+                "cny_rub": cbr_rates["cny_rub"],
+                "cbr_key_rate": key_rate
+            },
+            "simulation_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    def train(self, df: pd.DataFrame, n_workers: int = None) -> dict:
+        """Fit one LightGBM model per category on lag/rolling features, in parallel processes.
+
+        Each worker gets ``cores // n_workers`` LightGBM threads. After
+        fitting, the latest history of every series is kept and rolled
+        forward month by month past the forecast horizon, so ``forecast`` and
+        ``forecast_cube`` read model predictions by array lookup. The first 12
+        rolled-out months also give per-category seasonal profiles (see
+        ``_apply_seasonality``) for the table fallback.
+        """
+        started = time.perf_counter()
+        frame, regions = build_lag_features(df)
+        frame = frame.dropna(subset=list(DEMAND_FEATURES)).reset_index(drop=True)
+        categories = list(frame["category"].unique())
+        cores = os.cpu_count() or 1
+        n_workers = n_workers or min(len(categories), cores)
+        n_threads = max(1, cores // n_workers)
+        
+        jobs = []
+        for category in categories:
+            part = frame[frame["category"] == category]
+            jobs.append((category, part[list(DEMAND_FEATURES)].to_numpy(dtype=np.float32),
+                         part["target"].to_numpy(), part["holdout"].to_numpy(), n_threads))
+        if n_workers == 1:
+            results = [_fit_category(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                results = list(pool.map(_fit_category, *zip(*jobs)))
+        
+        self.model = {category: model for category, model, _ in results}
+        self.metrics = {category: metrics for category, _, metrics in results}
+        self.feature_names = list(DEMAND_FEATURES)
+        self.regions = regions
+        self.history = self._series_history(frame)
+        self._build_rollout()
+        self.learned_seasonality = self._precompute_seasonality()
+        self._apply_seasonality()
+        
+        train_seconds = time.perf_counter() - started
+        mape = np.mean([m["mape"] for m in self.metrics.values()])
+        print(f"[DemandForecaster] Trained {len(self.model)} category models on {len(frame)} rows "
+              f"({n_workers} workers x {n_threads} threads, {train_seconds:.1f} s) -> holdout MAPE: {mape:.2%}")
+        return {"categories": self.metrics, "mape": float(mape), "train_seconds": round(train_seconds, 2)}
+
+    @staticmethod
+    def _series_history(frame: pd.DataFrame) -> dict:
+        """Latest ``DEMAND_HISTORY_DEPTH`` log-demand values, region code and last month of every series.
+
+        Series shorter than the depth are skipped; a category with none long
+        enough is left to the tables. Months are absolute (``year * 12 + month - 1``).
+        """
+        history = {}
+        for category, part in frame.groupby("category", sort=False):
+            sizes = part.groupby("region", sort=True).size()
+            part = part[part["region"].isin(sizes.index[sizes >= DEMAND_HISTORY_DEPTH])]
+            if part.empty:
+                continue
+            # The frame is sorted by region and period, so each region's tail is contiguous and in order
+            tails = part.groupby("region", sort=True).tail(DEMAND_HISTORY_DEPTH)
+            last = part.groupby("region", sort=True).last()
+            history[str(category).lower().strip()] = {
+                "category": category,
+                "regions": [str(r).lower().strip() for r in last.index],
+                "region_code": last["region_code"].to_numpy(),
+                "last_month": (last["period_date"].dt.year * 12 + last["period_date"].dt.month - 1).to_numpy(),
+                "history": tails["target"].to_numpy(dtype=np.float64).reshape(len(last), DEMAND_HISTORY_DEPTH)
+            }
+        return history
+
+    def _roll_out(self, cat_key: str, steps: int) -> np.ndarray:
+        """(series, steps) predicted volumes; column ``s`` is month ``last_month + s + 1`` of each series."""
+        series = self.history[cat_key]
+        model = self.model[series["category"]]
+        history = np.array(series["history"], dtype=np.float64)
+        codes = series["region_code"]
+        month = series["last_month"] % 12 + 1
+        volumes = np.empty((len(codes), steps))
+        for step in range(steps):
+            month = month % 12 + 1
+            columns = {"month": month, "region_code": codes}
+            for lag in DEMAND_LAGS:
+                columns[f"lag_{lag}"] = history[:, -lag]
+            for w in DEMAND_WINDOWS:
+                columns[f"rolling_mean_{w}"] = history[:, -w:].mean(axis=1)
+            columns["rolling_std_12"] = history[:, -12:].std(axis=1, ddof=1)
+            features = np.column_stack([columns[name] for name in DEMAND_FEATURES]).astype(np.float32)
+            predicted = model.predict(features)
+            history = np.column_stack([history[:, 1:], predicted])
+            volumes[:, step] = np.expm1(predicted)
+        return volumes
+
+    def _build_rollout(self, until: int = None):
+        """Roll every series out to absolute month ``until`` and index the volumes by calendar month.
+
+        At least ``DEMAND_ROLLOUT_MONTHS`` past the current month is covered, so
+        forecasts made over the following days do not extend it again.
+        """
+        now = datetime.now()
+        until = max(until or 0, now.year * 12 + now.month - 1 + DEMAND_ROLLOUT_MONTHS)
+        rollout = {}
+        for cat_key, series in self.history.items():
+            last = np.asarray(series["last_month"])
+            start = int(last.min()) + 1
+            width = until - start + 1
+            if width <= 0:
+                continue
+            volumes = self._roll_out(cat_key, width)
+            # Series that end later start later: shift each row to its own first month
+            columns = (last - start + 1)[:, None] + np.arange(width)[None, :]
+            table = np.full((len(last), width), np.nan)
+            rows = np.broadcast_to(np.arange(len(last))[:, None], columns.shape)
+            inside = columns < width
+            table[rows[inside], columns[inside]] = volumes[inside]
+            rollout[cat_key] = (start, {r: i for i, r in enumerate(series["regions"])}, table)
+        self._rollout = (until, rollout)
+
+    def _model_volumes(self, cat_keys: list, reg_keys: list, target_dates: list) -> np.ndarray:
+        """(C, R, H) rolled-out model volumes for the target months; NaN where no trained series covers one."""
+        months = np.array([d.year * 12 + d.month - 1 for d in target_dates])
+        volumes = np.full((len(cat_keys), len(reg_keys), len(months)), np.nan)
+        if not self.history or not len(months):
+            return volumes
+        if self._rollout is None or months.max() > self._rollout[0]:
+            self._build_rollout(int(months.max()))
+        _, rollout = self._rollout
+        for ci, cat_key in enumerate(cat_keys):
+            if cat_key not in rollout:
+                continue
+            start, rows, table = rollout[cat_key]
+            columns = months - start
+            valid = (columns >= 0) & (columns < table.shape[1])
+            for ri, reg_key in enumerate(reg_keys):
+                row = rows.get(reg_key)
+                if row is not None:
+                    volumes[ci, ri, valid] = table[row, columns[valid]]
+        return volumes
+
+    def _precompute_seasonality(self, steps: int = 12) -> dict:
+        """Per-category monthly profile from the first ``steps`` rolled-out months of every series.
+
+        Each series is normalized by its own mean before the series are
+        averaged, so large regions do not drown out the shape of small ones.
+        """
+        seasonality = {}
+        for cat_key, series in self.history.items():
+            volumes = self._roll_out(cat_key, steps)
+            shape = volumes / np.maximum(volumes.mean(axis=1, keepdims=True), 1e-9)
+            month = (np.asarray(series["last_month"])[:, None] + np.arange(1, steps + 1)[None, :]) % 12
+            total = np.bincount(month.ravel(), weights=shape.ravel(), minlength=12)
+            count = np.bincount(month.ravel(), minlength=12)
+            seasonality[cat_key] = {m + 1: round(float(total[m] / count[m]), 2) if count[m] else 1.0 for m in range(12)}
+        return seasonality
+
+    def _apply_seasonality(self):
+        """Use learned profiles in place of the curated ones where the data shows a seasonal shape.
+
+        A flat learned profile means the training data carry no monthly
+        signal, so the curated profile stays; categories without one always
+        take the learned profile.
+        """
+        for category, profile in self.learned_seasonality.items():
+            amplitude = max(profile.values()) - min(profile.values())
+            if category not in self.category_seasonality or amplitude >= DEMAND_MIN_SEASONAL_AMPLITUDE:
+                self.category_seasonality[category] = profile
+
     def save(self, filepath: str):
-        joblib.dump({"model": self.model}, filepath)
+        joblib.dump({
+            "model": self.model,
+            "feature_names": self.feature_names,
+            "regions": self.regions,
+            "seasonality": self.learned_seasonality,
+            "history": self.history,
+            "metrics": self.metrics,
+            "backtest": self.backtest
+        }, filepath)
 
-    def load(self, filepath: str):
-        data = joblib.load(filepath)
-        self.model = data.get("model")
\ No newline at end of file
+    def load(self, filepath: str, mmap_mode: str = None):
+        data = joblib.load(filepath, mmap_mode=mmap_mode)
+        self.model = data.get("model")
+        self.feature_names = data.get("feature_names")
+        self.regions = data.get("regions")
+        self.metrics = data.get("metrics", {})
+        self.backtest = data.get("backtest", {})
+        self.learned_seasonality = data.get("seasonality", {})
+        # Artifacts saved before the history was kept have no rollout and are served from the tables
+        self.history = data.get("history", {}) if isinstance(self.model, dict) else {}
+        self._rollout = None
+        if self.history:
+            self._build_rollout()
+        self._apply_seasonality()
\ No newline at end of file
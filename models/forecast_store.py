@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from utils.macro_provider import cbr_rates_cache
+
+FORECAST_STORE_DIR = os.getenv("FORECAST_STORE_DIR", "cache/forecast_store")
+FORECAST_STORE_MAX_HORIZON = 24
+# Last axis of the stored array
+FORECAST_STORE_FIELDS = ("predicted_volume", "lower_bound", "upper_bound", "average_monthly_demand")
+
+
+def store_key(forecaster) -> dict:
+    """Inputs the materialized forecasts depend on: calendar day, CBR snapshot and model version."""
+    return {
+        "day": datetime.now().strftime("%Y-%m-%d"),
+        "cbr_date": cbr_rates_cache.date() or "fallback",
+        "model_version": str(forecaster.model_version) if forecaster.model_version else None
+    }
+
+
+def materialize(forecaster, store_dir: str = FORECAST_STORE_DIR, key: dict = None) -> str:
+    """Batch job: precompute every category × region × horizon (1..24) into a .npy file plus a JSON index.
+
+    Month ``i`` of a forecast does not depend on the horizon, so one 24-month
+    cube holds every horizon; the running mean is stored per horizon so the
+    average is a lookup too. The data file is written under a unique name and
+    the index is swapped in with ``os.replace``, so readers always see a
+    complete pair.
+    """
+    key = key or store_key(forecaster)
+    os.makedirs(store_dir, exist_ok=True)
+    cube = forecaster.forecast_cube(FORECAST_STORE_MAX_HORIZON)
+    horizon = np.arange(1, FORECAST_STORE_MAX_HORIZON + 1)
+    running_avg = np.round(np.cumsum(cube["predicted_volume"], axis=2) / horizon, 0)
+    data = np.stack([cube["predicted_volume"], cube["lower_bound"], cube["upper_bound"], running_avg], axis=-1)
+
+    data_name = f"forecasts_{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{os.getpid()}.npy"
+    np.save(os.path.join(store_dir, data_name), data)
+    index = {
+        **key,
+        "data_file": data_name,
+        "categories": cube["categories"],
+        "regions": cube["regions"],
+        "months": cube["months"],
+        "seasonal_factor": cube["seasonal_factor"].tolist(),
+        "macro_context": cube["macro_context"],
+        "accuracy_mape_percent": {c: forecaster.accuracy_mape(c) for c in cube["categories"]}
+    }
+    index_path = os.path.join(store_dir, "index.json")
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+    # Older data files are no longer referenced; open memmaps keep their pages until closed
+    for name in os.listdir(store_dir):
+        if name.startswith("forecasts_") and name.endswith(".npy") and name != data_name:
+            try:
+                os.remove(os.path.join(store_dir, name))
+            except OSError:
+                pass
+    return index_path
+
+
+class ForecastStore:
+    """Serves ``DemandForecaster.forecast`` answers from the materialized, memory-mapped forecasts.
+
+    Each lookup checks the store key (day, CBR date, model version). When it
+    rolls over, a background thread rebuilds the store, or picks it up if
+    another worker already rebuilt it. Until the new store is open, lookups
+    return None and the caller computes forecasts live, so request handlers
+    never wait on a rebuild. Unknown categories or regions also return None.
+    """
+
+    def __init__(self, store_dir: str = FORECAST_STORE_DIR):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        # (index, memmapped data, category -> row, region -> column), swapped as one reference
+        self._store = None
+
+    def _open(self) -> bool:
+        index_path = os.path.join(self.store_dir, "index.json")
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            data = np.load(os.path.join(self.store_dir, index["data_file"]), mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return False
+        self._store = (
+            index, data,
+            {c: i for i, c in enumerate(index["categories"])},
+            {r: i for i, r in enumerate(index["regions"])}
+        )
+        return True
+
+    def _is_current(self, key: dict) -> bool:
+        store = self._store
+        return store is not None and all(store[0].get(k) == v for k, v in key.items())
+
+    def _rebuild(self, forecaster, key: dict):
+        try:
+            if not (self._open() and self._is_current(key)):
+                materialize(forecaster, self.store_dir, key)
+                self._open()
+        except Exception as e:
+            print(f"[ForecastStore] Materialization failed, serving live forecasts: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def ensure(self, forecaster) -> bool:
+        """True if the open store matches the current key; otherwise start a background rebuild and return False."""
+        key = store_key(forecaster)
+        if self._is_current(key):
+            return True
+        with self._lock:
+            if self._rebuilding:
+                return False
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, args=(forecaster, key), name="forecast-store-rebuild", daemon=True).start()
+        return False
+
+    def get(self, forecaster, category: str, region: str, months_ahead: int):
+        """Stored forecast in the same format as ``DemandForecaster.forecast``; None for unknown keys."""
+        if not 1 <= months_ahead <= FORECAST_STORE_MAX_HORIZON:
+            return None
+        if not self.ensure(forecaster):
+            return None
+        index, data, categories, regions = self._store
+        cat_key = category.lower().strip()
+        ci = categories.get(cat_key)
+        ri = regions.get(region.lower().strip())
+        if ci is None or ri is None:
+            return None
+
+        # Zero-copy view into the memmap: (months, fields)
+        rows = data[ci, ri, :months_ahead]
+        seasonal = index["seasonal_factor"][ci]
+        predicted, lower, upper = rows[:, 0].tolist(), rows[:, 1].tolist(), rows[:, 2].tolist()
+        return {
+            "category": category,
+            "region": region,
+            "forecast_horizon_months": months_ahead,
+            "average_monthly_demand": float(rows[-1, 3]),
+            "macro_context": index["macro_context"],
+            "monthly_forecasts": [{
+                "month": index["months"][h],
+                "predicted_volume": predicted[h],
+                "lower_bound": lower[h],
+                "upper_bound": upper[h],
+                "seasonal_factor": seasonal[h]
+            } for h in range(months_ahead)],
+            "accuracy_mape_percent": index["accuracy_mape_percent"][cat_key]
+        }
+
+    def info(self) -> dict:
+        store = self._store
+        if store is None:
+            return {"built": False, "rebuilding": self._rebuilding}
+        return {"built": True, "rebuilding": self._rebuilding,
+                **{k: store[0][k] for k in ("day", "cbr_date", "model_version", "data_file")}}
+
+
+if __name__ == "__main__":
+    import argparse
+    from models.registry import ModelRegistry
+    from utils.macro_provider import MacroDataProvider
+
+    parser = argparse.ArgumentParser(description="Materialize today's demand forecasts for every category, region and horizon")
+    parser.add_argument("--out", default=FORECAST_STORE_DIR)
+    args = parser.parse_args()
+
+    # Wait for a real CBR snapshot so the store is keyed by its publication date
+    cbr_rates_cache.refresh(MacroDataProvider())
+    registry = ModelRegistry()
+    registry.load_latest("demand_forecaster")
+    print(f"Saved forecast store index to {materialize(registry.get('demand_forecaster'), args.out)}")
@@ -0,0 +1,86 @@
+import numpy as np
+
+# Rows per block: keeps the (rows, components, features) intermediate at a few dozen MB
+GMM_SCORER_CHUNK_ROWS = 131072
+
+
+def _yeo_johnson(X: np.ndarray, lambdas: np.ndarray) -> np.ndarray:
+    """Column-wise Yeo-Johnson transform, matching sklearn's PowerTransformer."""
+    eps = np.spacing(1.0)
+    negative = X < 0
+    # Both branches are evaluated on clipped copies so no power sees an invalid base
+    X_pos = np.maximum(X, 0.0)
+    lam_pos = np.where(np.abs(lambdas) < eps, 1.0, lambdas)
+    pos = np.where(np.abs(lambdas) < eps, np.log1p(X_pos), (np.power(X_pos + 1, lam_pos) - 1) / lam_pos)
+    if not negative.any():
+        # RFM inputs are non-negative in practice; skip the second power entirely
+        return pos
+    X_neg = np.maximum(-X, 0.0)
+    lam_neg = np.where(np.abs(lambdas - 2) < eps, 1.0, 2 - lambdas)
+    neg = np.where(np.abs(lambdas - 2) < eps, -np.log1p(X_neg), -(np.power(X_neg + 1, lam_neg) - 1) / lam_neg)
+    return np.where(negative, neg, pos)
+
+
+class GMMScorer:
+    """Closed-form cluster posteriors for a fitted PowerTransformer + GaussianMixture pair.
+
+    The fitted parameters are copied into plain arrays once, so scoring is a
+    handful of vectorized NumPy operations with no DataFrame or estimator
+    validation overhead, for one row or millions.
+    """
+
+    def __init__(self, lambdas, shift, scale, weights, means, precisions_cholesky):
+        self.lambdas = np.asarray(lambdas, dtype=float)
+        self.shift = np.asarray(shift, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.log_weights = np.log(np.asarray(weights, dtype=float))
+        self.means = np.asarray(means, dtype=float)
+        self.precisions_cholesky = np.asarray(precisions_cholesky, dtype=float)
+        n_features = self.means.shape[1]
+        # Per-component constant: log|P_k| - d/2 * log(2*pi) + log(w_k)
+        log_det = np.log(np.diagonal(self.precisions_cholesky, axis1=1, axis2=2)).sum(axis=1)
+        self.log_norm = log_det - 0.5 * n_features * np.log(2 * np.pi) + self.log_weights
+        # (x - mu_k) @ P_k == x @ P_k - mu_k @ P_k; all components in one (d, k*d) matmul
+        self.means_prec = np.einsum("kd,kde->ke", self.means, self.precisions_cholesky)
+        n_components = len(self.log_norm)
+        self.prec_stacked = self.precisions_cholesky.transpose(1, 0, 2).reshape(n_features, n_components * n_features)
+
+    @classmethod
+    def from_sklearn(cls, transformer, gmm):
+        n_components, n_features = gmm.means_.shape
+        prec_chol = gmm.precisions_cholesky_
+        if gmm.covariance_type == "tied":
+            prec_chol = np.broadcast_to(prec_chol, (n_components, n_features, n_features))
+        elif gmm.covariance_type == "diag":
+            prec_chol = np.stack([np.diag(p) for p in prec_chol])
+        elif gmm.covariance_type == "spherical":
+            prec_chol = np.stack([np.eye(n_features) * p for p in prec_chol])
+
+        if getattr(transformer, "standardize", False):
+            shift, scale = transformer._scaler.mean_, transformer._scaler.scale_
+        else:
+            shift, scale = np.zeros(n_features), np.ones(n_features)
+        return cls(transformer.lambdas_, shift, scale, gmm.weights_, gmm.means_, prec_chol)
+
+    def transform(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        return (_yeo_johnson(X, self.lambdas) - self.shift) / self.scale
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Posterior probability of every component, shape (n_rows, n_components)."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        out = np.empty((len(X), len(self.log_norm)))
+        for start in range(0, len(X), GMM_SCORER_CHUNK_ROWS):
+            Z = self.transform(X[start:start + GMM_SCORER_CHUNK_ROWS])
+            Y = (Z @ self.prec_stacked).reshape(len(Z), *self.means_prec.shape) - self.means_prec
+            log_prob = self.log_norm - 0.5 * np.einsum("nke,nke->nk", Y, Y)
+            log_prob -= log_prob.max(axis=1, keepdims=True)
+            prob = np.exp(log_prob)
+            out[start:start + len(Z)] = prob / prob.sum(axis=1, keepdims=True)
+        return out
+
+    def predict(self, X):
+        """Most likely component per row and its posterior probability."""
+        proba = self.predict_proba(X)
+        labels = proba.argmax(axis=1)
+        return labels, proba[np.arange(len(labels)), labels]
@@ -1,19 +1,64 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import train_test_split, HalvingRandomSearchCV, KFold
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler, RobustScaler
 from sklearn.impute import SimpleImputer
+import copy
 import joblib
+import json
 import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from scipy.stats import loguniform, randint, uniform
+from threadpoolctl import threadpool_limits
+
+# "gbr" (exact GradientBoosting, single core), "hist" (sklearn histogram GBDT) or "lightgbm"
+LOCATION_TRAIN_ENGINE = os.getenv("LOCATION_TRAIN_ENGINE", "gbr")
+LOCATION_TRAIN_ENGINES = ("gbr", "hist", "lightgbm")
+# A warm-start update is rejected if its holdout RMSE is worse than the current model's by more than this share
+LOCATION_UPDATE_TOLERANCE = float(os.getenv("LOCATION_UPDATE_TOLERANCE", "0.01"))
+
+# Regressor search spaces for LocationAnalyzer.tune, sampled by HalvingRandomSearchCV
+LOCATION_SEARCH_SPACES = {
+    "gbr": {
+        "learning_rate": loguniform(0.02, 0.3),
+        "max_depth": randint(3, 8),
+        "min_samples_leaf": randint(1, 100),
+        "subsample": uniform(0.6, 0.4)
+    },
+    "hist": {
+        "learning_rate": loguniform(0.02, 0.3),
+        "max_leaf_nodes": randint(15, 128),
+        "min_samples_leaf": randint(10, 200),
+        "l2_regularization": loguniform(1e-3, 10.0)
+    },
+    # No eval set inside CV, so the tree count is searched instead of early-stopped
+    "lightgbm": {
+        "n_estimators": randint(100, 600),
+        "learning_rate": loguniform(0.02, 0.3),
+        "num_leaves": randint(15, 128),
+        "min_child_samples": randint(10, 200),
+        "reg_lambda": loguniform(1e-3, 10.0)
+    }
+}
 
 class LocationAnalyzer:
     """High-accuracy Location Revenue Analyzer using log1p target transformation & feature engineering."""
     
     def __init__(self):
         self.model = None
+        self.model_version = None
+        # Optional OnnxLocationEngine; None runs the sklearn pipeline
+        self.inference_engine = None
+        self.lut = None
+        # One entry per fit: the full train, then each warm-start update on top of it
+        self.lineage = []
         self.feature_names = ['pedestrian_traffic', 'avg_purchase_value', 'potential_market_volume', 'traffic_log', 'purchase_log', 'district_encoded']
         self.scaler = RobustScaler()
         self.district_mapping = {
@@ -31,13 +76,167 @@ class LocationAnalyzer:
             X['purchase_log'] = np.log1p(X['avg_purchase_value'])
             
         if 'district' in X.columns:
-            X['district_encoded'] = X['district'].map(lambda d: self.district_mapping.get(str(d).lower(), 0))
+            X['district_encoded'] = X['district'].astype(str).str.lower().map(self.district_mapping).fillna(0).astype(int)
             X = X.drop(columns=['district'])
             
         return X
 
-    def train(self, X: pd.DataFrame, y: pd.Series, features: list = None):
-        """Train Gradient Boosting model on log1p(y) for maximum R² and minimum MAE."""
+    def _prepare_features(self, raw_df: pd.DataFrame) -> pd.DataFrame:
+        """Engineer features and align columns with the trained feature order."""
+        features_df = self._create_features(raw_df)
+        
+        active_features = self.feature_names or ['pedestrian_traffic', 'avg_purchase_value', 'potential_market_volume', 'traffic_log', 'purchase_log', 'district_encoded']
+        for f in active_features:
+            if f not in features_df.columns:
+                features_df[f] = 0.0
+                
+        return features_df[active_features]
+
+    def _predict_revenue(self, features_df: pd.DataFrame) -> np.ndarray:
+        if self.inference_engine is not None:
+            return self.inference_engine.predict_revenue(features_df)
+        return np.expm1(self.model.predict(features_df))
+
+    def _build_regressor(self, engine: str, n_jobs: int):
+        if engine == "gbr":
+            return GradientBoostingRegressor(
+                n_estimators=150,
+                learning_rate=0.05,
+                max_depth=5,
+                random_state=42
+            )
+        if engine == "hist":
+            # Bins features into 255 buckets; stops once 20 rounds bring no gain on the validation split
+            return HistGradientBoostingRegressor(
+                max_iter=1000,
+                learning_rate=0.1,
+                max_leaf_nodes=31,
+                early_stopping=True,
+                validation_fraction=0.1,
+                n_iter_no_change=20,
+                random_state=42
+            )
+        if engine == "lightgbm":
+            import lightgbm as lgb
+            return lgb.LGBMRegressor(
+                n_estimators=1000,
+                learning_rate=0.1,
+                num_leaves=31,
+                n_jobs=n_jobs,
+                random_state=42,
+                verbose=-1
+            )
+        raise ValueError(f"Unknown training engine '{engine}', expected one of {LOCATION_TRAIN_ENGINES}")
+
+    @staticmethod
+    def _engine_of(regressor) -> str:
+        if isinstance(regressor, GradientBoostingRegressor):
+            return "gbr"
+        if isinstance(regressor, HistGradientBoostingRegressor):
+            return "hist"
+        return "lightgbm"
+
+    @staticmethod
+    def _n_trees(regressor) -> int:
+        n_trees = getattr(regressor, "best_iteration_", None) or getattr(regressor, "n_iter_", None) or getattr(regressor, "n_estimators_", None) or regressor.n_estimators
+        return int(n_trees)
+
+    def _evaluate(self, X_test: pd.DataFrame, y_test_log: pd.Series, model=None) -> dict:
+        y_pred = np.expm1((model or self.model).predict(X_test))
+        y_test = np.expm1(y_test_log)
+        return {
+            "r2": r2_score(y_test, y_pred),
+            "mae": mean_absolute_error(y_test, y_pred),
+            "rmse": np.sqrt(mean_squared_error(y_test, y_pred))
+        }
+
+    def _build_pipeline(self, engine: str, n_jobs: int, params: dict = None, memory=None) -> Pipeline:
+        regressor = self._build_regressor(engine, n_jobs)
+        if params:
+            regressor.set_params(**params)
+        return Pipeline([
+            ('imputer', SimpleImputer(strategy='median')),
+            ('scaler', RobustScaler()),
+            ('regressor', regressor)
+        ], memory=memory)
+
+    def tune(self, X: pd.DataFrame, y: pd.Series, engine: str = LOCATION_TRAIN_ENGINE, n_candidates: int = 48,
+             cv: int = 3, n_jobs: int = -1, cache_dir: str = None, random_state: int = 42) -> dict:
+        """Cross-validated successive-halving search over the boosting parameters.
+
+        Candidates start on a small sample of rows and only the best third
+        advances to each 3x larger round, so most of the budget is spent on
+        promising configurations. Features are engineered once up front, the
+        per-fold imputer/scaler fits are cached with joblib.Memory and shared by
+        all candidates, and candidates run in parallel across ``n_jobs`` cores.
+        Returns the best regressor params for ``train(..., params=...)``.
+        """
+        started = time.perf_counter()
+        X_engineered = self._create_features(X)
+        y_log = np.log1p(y)
+        
+        # Size the first round so the last one (a few survivors) sees every row
+        factor = 3
+        # Rounds until fewer than ``factor`` candidates would remain, as HalvingRandomSearchCV counts them
+        n_rounds = 1 + int(np.floor(np.log(n_candidates) / np.log(factor)))
+        min_resources = max(len(X_engineered) // factor ** (n_rounds - 1), 50 * cv)
+        
+        own_cache = cache_dir is None
+        cache_dir = cache_dir or tempfile.mkdtemp(prefix="location_tune_")
+        try:
+            # Threads stay at 1 per fit: the search itself is parallel across candidates
+            search = HalvingRandomSearchCV(
+                self._build_pipeline(engine, n_jobs=1, memory=cache_dir),
+                {f"regressor__{name}": dist for name, dist in LOCATION_SEARCH_SPACES[engine].items()},
+                n_candidates=n_candidates,
+                factor=factor,
+                min_resources=min_resources,
+                cv=KFold(cv, shuffle=True, random_state=random_state),
+                scoring="neg_root_mean_squared_error",
+                n_jobs=n_jobs,
+                random_state=random_state
+            )
+            search.fit(X_engineered, y_log)
+        finally:
+            if own_cache:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        
+        params = {name.removeprefix("regressor__"): value for name, value in search.best_params_.items()}
+        result = {
+            "engine": engine,
+            "params": {k: v.item() if hasattr(v, "item") else v for k, v in params.items()},
+            "cv_rmse_log": float(-search.best_score_),
+            "n_candidates": n_candidates,
+            "n_rounds": int(search.n_iterations_),
+            "n_resources": [int(n) for n in search.n_resources_],
+            "n_rows": len(X_engineered),
+            "tune_seconds": time.perf_counter() - started
+        }
+        print(f"[LocationAnalyzer] Tuned {engine} ({n_candidates} candidates, {result['n_rounds']} rounds, {result['tune_seconds']:.1f} s) -> CV RMSE(log): {result['cv_rmse_log']:.4f}, params: {result['params']}")
+        return result
+
+    @staticmethod
+    def params_path(artifact_path: str) -> str:
+        """Tuned configuration sits next to the artifact: location_analyzer_v<version>.params.json."""
+        return os.path.splitext(artifact_path)[0] + ".params.json"
+
+    @staticmethod
+    def save_params(tuning: dict, artifact_path: str) -> str:
+        path = LocationAnalyzer.params_path(artifact_path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(tuning, f, indent=2, ensure_ascii=False)
+        return path
+
+    def train(self, X: pd.DataFrame, y: pd.Series, features: list = None, engine: str = LOCATION_TRAIN_ENGINE,
+              n_jobs: int = -1, params: dict = None):
+        """Train a gradient boosting model on log1p(y) for maximum R² and minimum MAE.
+
+        ``engine="gbr"`` is the exact single-core GradientBoosting; ``"hist"`` and
+        ``"lightgbm"`` are histogram-based, multithreaded across ``n_jobs`` cores
+        and early-stopped on a validation split, for 100k+ row datasets.
+        ``params`` overrides regressor hyperparameters, e.g. from ``tune``.
+        """
+        started = time.perf_counter()
         y_log = np.log1p(y)
         
         X_engineered = self._create_features(X)
@@ -47,54 +246,141 @@ class LocationAnalyzer:
             X_engineered, y_log, test_size=0.2, random_state=42
         )
         
-        pipeline = Pipeline([
-            ('imputer', SimpleImputer(strategy='median')),
-            ('scaler', RobustScaler()),
-            ('regressor', GradientBoostingRegressor(
-                n_estimators=150,
-                learning_rate=0.05,
-                max_depth=5,
-                random_state=42
-            ))
-        ])
+        pipeline = self._build_pipeline(engine, n_jobs, params)
         
-        pipeline.fit(X_train, y_train_log)
+        with threadpool_limits(limits=None if n_jobs == -1 else n_jobs, user_api="openmp"):
+            if engine == "lightgbm":
+                import lightgbm as lgb
+                # LightGBM needs an explicit eval set, so preprocess it with the pipeline's own fitted steps
+                X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train_log, test_size=0.1, random_state=42)
+                preprocess = pipeline[:-1]
+                X_fit_t = preprocess.fit_transform(X_fit)
+                pipeline[-1].fit(
+                    X_fit_t, y_fit,
+                    eval_set=[(preprocess.transform(X_val), y_val)],
+                    callbacks=[lgb.early_stopping(20, verbose=False)]
+                )
+            else:
+                pipeline.fit(X_train, y_train_log)
         self.model = pipeline
+        self.lut = None
+        train_seconds = time.perf_counter() - started
         
-        y_pred_log = self.model.predict(X_test)
-        y_pred = np.expm1(y_pred_log)
-        y_test = np.expm1(y_test_log)
+        metrics = self._evaluate(X_test, y_test_log)
+        n_trees = self._n_trees(self.model[-1])
+        self.lineage = [{
+            "kind": "full",
+            "engine": engine,
+            "n_rows": len(X_engineered),
+            "n_trees_added": n_trees,
+            "n_trees_total": n_trees,
+            "trained_at": datetime.now().isoformat(timespec="seconds")
+        }]
+        
+        print(f"[LocationAnalyzer] Trained {engine} model ({n_trees} trees, {train_seconds:.1f} s) -> R²: {metrics['r2']:.4f}, MAE: {metrics['mae']:.2f} RUB, RMSE: {metrics['rmse']:.2f} RUB")
+        return dict(metrics, engine=engine, n_trees=n_trees, train_seconds=train_seconds)
+
+    def update(self, X_new: pd.DataFrame, y_new: pd.Series, X_recent: pd.DataFrame = None, y_recent: pd.Series = None,
+               n_new_trees: int = 50, n_jobs: int = -1, tolerance: float = LOCATION_UPDATE_TOLERANCE) -> dict:
+        """Warm-start the fitted ensemble with extra trees on new (plus recent) observations.
+
+        The imputer/scaler and feature set stay as fitted by ``train``; only
+        the boosting stage grows, fitting the residuals of the current
+        ensemble. The update runs on a copy. 20% of the new rows are held out
+        and the old and updated models are scored on them. The copy replaces
+        the live model (and is appended to ``lineage``) only if its holdout
+        RMSE is at most ``tolerance`` worse; otherwise the result has
+        ``applied=False`` and the model is left untouched.
+        """
+        if self.model is None:
+            raise ValueError("LocationAnalyzer has no trained model to update; run train() first")
+        
+        started = time.perf_counter()
+        X_train, X_test, y_train_log, y_test_log = train_test_split(
+            self._prepare_features(X_new), np.log1p(y_new), test_size=0.2, random_state=42
+        )
+        if X_recent is not None:
+            # Recent rows only join the training side, so the holdout stays on new data
+            X_train = pd.concat([X_train, self._prepare_features(X_recent)])
+            y_train_log = pd.concat([y_train_log, np.log1p(y_recent)])
+        before = self._evaluate(X_test, y_test_log)
+        
+        # Deep copy also detaches memory-mapped, read-only arrays of a loaded artifact
+        model = copy.deepcopy(self.model)
+        preprocess, regressor = model[:-1], model[-1]
+        engine = self._engine_of(regressor)
+        trees_before = self._n_trees(regressor)
         
-        r2 = r2_score(y_test, y_pred)
-        mae = mean_absolute_error(y_test, y_pred)
-        rmse = np.sqrt(mean_squared_error(y_test, y_pred))
+        with threadpool_limits(limits=None if n_jobs == -1 else n_jobs, user_api="openmp"):
+            if engine == "gbr":
+                regressor.set_params(warm_start=True, n_estimators=regressor.n_estimators_ + n_new_trees)
+                regressor.fit(preprocess.transform(X_train), y_train_log)
+            elif engine == "hist":
+                # Early stopping would compare against the previous fit's validation history and stop at once
+                regressor.set_params(warm_start=True, early_stopping=False, max_iter=regressor.n_iter_ + n_new_trees)
+                regressor.fit(preprocess.transform(X_train), y_train_log)
+            else:
+                import lightgbm as lgb
+                X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train_log, test_size=0.1, random_state=42)
+                booster = regressor.booster_
+                if regressor.best_iteration_:
+                    # Continue from the early-stopped ensemble, not the trees after the best iteration
+                    booster = lgb.Booster(model_str=booster.model_to_string(num_iteration=regressor.best_iteration_))
+                regressor = lgb.LGBMRegressor(**dict(regressor.get_params(), n_estimators=n_new_trees, n_jobs=n_jobs))
+                regressor.fit(
+                    preprocess.transform(X_fit), y_fit,
+                    eval_set=[(preprocess.transform(X_val), y_val)],
+                    callbacks=[lgb.early_stopping(20, verbose=False)],
+                    init_model=booster
+                )
+                model.steps[-1] = ('regressor', regressor)
         
-        print(f"[LocationAnalyzer] Trained Model -> R²: {r2:.4f}, MAE: {mae:.2f} RUB, RMSE: {rmse:.2f} RUB")
-        return {"r2": r2, "mae": mae, "rmse": rmse}
+        after = self._evaluate(X_test, y_test_log, model)
+        trees_after = regressor.booster_.current_iteration() if engine == "lightgbm" else self._n_trees(regressor)
+        update_seconds = time.perf_counter() - started
+        result = {"before": before, "after": after, "engine": engine, "n_trees_added": trees_after - trees_before,
+                  "update_seconds": update_seconds, "applied": after["rmse"] <= before["rmse"] * (1 + tolerance)}
+        if not result["applied"]:
+            print(f"[LocationAnalyzer] Warm-start {engine} update rejected: holdout RMSE {before['rmse']:.2f} -> "
+                  f"{after['rmse']:.2f} RUB (tolerance {tolerance:.0%}), keeping the current model")
+            return result
+        
+        self.model = model
+        self.inference_engine = None
+        self.lut = None
+        self.lineage = self.lineage + [{
+            "kind": "warm_start",
+            "engine": engine,
+            "parent_version": self.model_version,
+            "n_rows_new": len(X_new),
+            "n_rows_recent": len(X_recent) if X_recent is not None else 0,
+            "n_trees_added": trees_after - trees_before,
+            "n_trees_total": trees_after,
+            "trained_at": datetime.now().isoformat(timespec="seconds")
+        }]
+        
+        print(f"[LocationAnalyzer] Warm-start {engine} update (+{trees_after - trees_before} trees, {update_seconds:.1f} s) -> "
+              f"new-data holdout R²: {before['r2']:.4f} -> {after['r2']:.4f}, MAE: {before['mae']:.2f} -> {after['mae']:.2f} RUB")
+        return result
 
     def predict(self, pedestrian_traffic: float, avg_purchase_value: float, district: str = 'central', subways_count: int = 1, competitors_count: int = 3) -> dict:
         """Predict location revenue with high accuracy and confidence bounds."""
         district_encoded = self.district_mapping.get(str(district).lower(), 0)
         
-        raw_df = pd.DataFrame([{
-            'pedestrian_traffic': pedestrian_traffic,
-            'avg_purchase_value': avg_purchase_value,
-            'district': district
-        }])
-        
-        features_df = self._create_features(raw_df)
-        
-        active_features = self.feature_names or ['pedestrian_traffic', 'avg_purchase_value', 'potential_market_volume', 'traffic_log', 'purchase_log', 'district_encoded']
-        for f in active_features:
-            if f not in features_df.columns:
-                features_df[f] = 0.0
-                
-        features_df = features_df[active_features]
+        predicted_revenue = None
+        if self.model is not None and self.lut is not None:
+            # Array lookup, no DataFrame or model call; None means the model has to answer
+            predicted_revenue = self.lut.lookup(float(pedestrian_traffic), float(avg_purchase_value), district_encoded)
         
-        if self.model is not None:
-            pred_log = self.model.predict(features_df)[0]
-            predicted_revenue = float(np.expm1(pred_log))
-        else:
+        if predicted_revenue is None and self.model is not None:
+            raw_df = pd.DataFrame([{
+                'pedestrian_traffic': pedestrian_traffic,
+                'avg_purchase_value': avg_purchase_value,
+                'district': district
+            }])
+            features_df = self._prepare_features(raw_df)
+            predicted_revenue = float(self._predict_revenue(features_df)[0])
+        elif predicted_revenue is None:
             market_cap = pedestrian_traffic * avg_purchase_value * 0.12
             district_mult = 1.2 if district_encoded == 0 else 0.95
             predicted_revenue = market_cap * district_mult
@@ -112,10 +398,102 @@ class LocationAnalyzer:
             "recommendation": "Высокий потенциал точки" if location_score >= 7.5 else "Средний потенциал (требуется ручная проверка)"
         }
 
+    def predict_from_lut(self, pedestrian_traffic: float, avg_purchase_value: float, district: str = 'central'):
+        """``predict`` if the lookup table answers it without the model, else None."""
+        if self.model is None or self.lut is None:
+            return None
+        district_encoded = self.district_mapping.get(str(district).lower(), 0)
+        if self.lut.lookup(float(pedestrian_traffic), float(avg_purchase_value), district_encoded) is None:
+            return None
+        return self.predict(pedestrian_traffic, avg_purchase_value, district)
+
+    def predict_many(self, data, use_lut: bool = True) -> pd.DataFrame:
+        """Score many locations in one pipeline call.
+
+        ``data`` is a DataFrame or a mapping of equal-length columns with
+        ``pedestrian_traffic``, ``avg_purchase_value`` and optional ``district``.
+        With a lookup table enabled, rows it can answer (same rules as
+        ``predict``) skip the model, which then only scores the rest.
+        """
+        raw_df = pd.DataFrame(data)
+        if 'district' not in raw_df.columns:
+            raw_df['district'] = 'central'
+        raw_df['district'] = raw_df['district'].fillna('central')
+        
+        traffic = raw_df['pedestrian_traffic'].to_numpy(dtype=float)
+        purchase = raw_df['avg_purchase_value'].to_numpy(dtype=float)
+        
+        if len(raw_df) == 0:
+            predicted_revenue = np.empty(0)
+        elif self.model is not None:
+            predicted_revenue = np.full(len(raw_df), np.nan)
+            if use_lut and self.lut is not None:
+                codes = raw_df['district'].astype(str).str.lower().map(self.district_mapping).fillna(0).astype(int).to_numpy()
+                predicted_revenue = self.lut.lookup_rows(traffic, purchase, codes)
+            missing = np.isnan(predicted_revenue)
+            if missing.any():
+                features_df = self._prepare_features(raw_df.loc[missing, ['pedestrian_traffic', 'avg_purchase_value', 'district']])
+                predicted_revenue[missing] = self._predict_revenue(features_df)
+        else:
+            is_central = raw_df['district'].astype(str).str.lower().map(self.district_mapping).fillna(0).to_numpy() == 0
+            district_mult = np.where(is_central, 1.2, 0.95)
+            predicted_revenue = traffic * purchase * 0.12 * district_mult
+            
+        confidence_score = np.round(np.clip(0.85 + traffic / 25000, 0.75, 0.96), 2)
+        location_score = np.round(np.clip((predicted_revenue / 1500000) * 8.5, 3.0, 10.0), 1)
+        
+        return pd.DataFrame({
+            "predicted_monthly_revenue": np.round(predicted_revenue, 2),
+            "confidence_score": confidence_score,
+            "location_score": location_score,
+            "district": raw_df['district'].to_numpy(),
+            "pedestrian_traffic": traffic,
+            "avg_purchase_value": purchase,
+            "recommendation": np.where(location_score >= 7.5, "Высокий потенциал точки", "Средний потенциал (требуется ручная проверка)")
+        })
+
+    def enable_onnx(self, onnx_path: str, rtol: float = 1e-3) -> dict:
+        """Opt in to onnxruntime inference, exporting the pipeline to ``onnx_path`` if needed.
+
+        The engine is only switched on when its output matches sklearn within ``rtol``.
+        """
+        from models.onnx_export import OnnxLocationEngine, export_location_onnx, parity_check
+        
+        if not os.path.exists(onnx_path):
+            export_location_onnx(self, onnx_path)
+        engine = OnnxLocationEngine(onnx_path)
+        if engine.model_version != (str(self.model_version) if self.model_version else None):
+            export_location_onnx(self, onnx_path)
+            engine = OnnxLocationEngine(onnx_path)
+            
+        report = parity_check(self, engine, rtol=rtol)
+        if report["passed"]:
+            self.inference_engine = engine
+        else:
+            print(f"[LocationAnalyzer] ONNX parity check failed, staying on sklearn: {report}")
+        return report
+
+    def enable_lut(self, lut_path: str) -> dict:
+        """Serve ``predict`` from a precomputed lookup table stored at ``lut_path``.
+
+        The table is rebuilt whenever its model version differs from the
+        loaded model. Returns the table's error report against the model.
+        """
+        from models.location_lut import LocationLUT
+        
+        lut = LocationLUT.load(lut_path) if os.path.exists(lut_path) else None
+        if lut is None or lut.model_version != (str(self.model_version) if self.model_version else None):
+            lut = LocationLUT.build(self)
+            lut.save(lut_path)
+        self.lut = lut
+        return {**lut.error_report, "interpolation": lut.interpolation_ok}
+
     def save(self, filepath: str):
-        joblib.dump({"model": self.model, "feature_names": self.feature_names}, filepath)
+        joblib.dump({"model": self.model, "feature_names": self.feature_names, "lineage": self.lineage}, filepath)
 
-    def load(self, filepath: str):
-        data = joblib.load(filepath)
+    def load(self, filepath: str, mmap_mode: str = None):
+        data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = data["model"]
-        self.feature_names = data["feature_names"]
\ No newline at end of file
+        self.feature_names = data["feature_names"]
+        self.lut = None
+        self.lineage = data.get("lineage", [])
\ No newline at end of file
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+
+# Quantized input grid. POI traffic scores are sums of multiples of 50 and the
+# geo tab slider moves avg_check in 100 RUB steps, so interactive inputs land
+# exactly on grid points and are served without interpolation error.
+LUT_TRAFFIC_AXIS = np.arange(0, 30001, 50, dtype=np.float64)
+LUT_CHECK_AXIS = np.arange(100, 15001, 100, dtype=np.float64)
+# Off-grid inputs are interpolated only if the measured p99 relative error is within this bound
+LUT_MAX_P99_ERROR = float(os.getenv("LOCATION_LUT_MAX_P99_ERROR", "0.02"))
+
+
+def _bracket(axis: np.ndarray, x: np.ndarray):
+    """Lower grid index and interpolation weight of each x on a sorted axis (x assumed in range)."""
+    hi = np.clip(np.searchsorted(axis, x, side="right"), 1, len(axis) - 1)
+    lo = hi - 1
+    w = (x - axis[lo]) / (axis[hi] - axis[lo])
+    return lo, w
+
+
+class LocationLUT:
+    """Precomputed LocationAnalyzer revenue over a (district, traffic, avg_check) grid.
+
+    Values are stored as log1p(revenue) and interpolated bilinearly over
+    traffic and check, so a prediction is a handful of array lookups instead
+    of a DataFrame build and a model call. Tree ensembles are piecewise
+    constant, so interpolation between grid points can miss a split; off-grid
+    inputs are only interpolated when the measured error report is within
+    ``LUT_MAX_P99_ERROR``. Otherwise, and outside the grid, lookups return
+    None so the caller falls back to the model.
+    """
+
+    def __init__(self, log_revenue: np.ndarray, traffic_axis: np.ndarray, check_axis: np.ndarray,
+                 model_version=None, error_report: dict = None):
+        self.log_revenue = log_revenue
+        self.traffic_axis = traffic_axis
+        self.check_axis = check_axis
+        self.model_version = model_version
+        self.error_report = error_report or {}
+
+    @classmethod
+    def build(cls, analyzer, traffic_axis: np.ndarray = LUT_TRAFFIC_AXIS, check_axis: np.ndarray = LUT_CHECK_AXIS) -> "LocationLUT":
+        n_districts = max(analyzer.district_mapping.values()) + 1
+        codes_to_name = {code: name for name, code in analyzer.district_mapping.items()}
+        district, traffic, check = np.meshgrid(np.arange(n_districts), traffic_axis, check_axis, indexing="ij")
+        scored = analyzer.predict_many({
+            "pedestrian_traffic": traffic.ravel(),
+            "avg_purchase_value": check.ravel(),
+            "district": [codes_to_name[c] for c in district.ravel()]
+        }, use_lut=False)
+        log_revenue = np.log1p(np.maximum(scored["predicted_monthly_revenue"].to_numpy(dtype=np.float64), 0.0))
+        lut = cls(log_revenue.reshape(district.shape).astype(np.float32), traffic_axis, check_axis, analyzer.model_version)
+        lut.error_report = lut.measure_error(analyzer)
+        return lut
+
+    def in_range(self, traffic, check) -> np.ndarray:
+        traffic, check = np.asarray(traffic, dtype=np.float64), np.asarray(check, dtype=np.float64)
+        return ((traffic >= self.traffic_axis[0]) & (traffic <= self.traffic_axis[-1])
+                & (check >= self.check_axis[0]) & (check <= self.check_axis[-1]))
+
+    def lookup_many(self, traffic, check, district_codes) -> np.ndarray:
+        """Interpolated revenue for arrays of inputs; NaN where outside the grid."""
+        traffic = np.atleast_1d(np.asarray(traffic, dtype=np.float64))
+        check = np.atleast_1d(np.asarray(check, dtype=np.float64))
+        district_codes = np.broadcast_to(np.asarray(district_codes, dtype=np.int64), traffic.shape)
+        inside = self.in_range(traffic, check)
+        t = np.clip(traffic, self.traffic_axis[0], self.traffic_axis[-1])
+        c = np.clip(check, self.check_axis[0], self.check_axis[-1])
+        ti, tw = _bracket(self.traffic_axis, t)
+        ci, cw = _bracket(self.check_axis, c)
+        v = self.log_revenue
+        log_rev = ((1 - tw) * (1 - cw) * v[district_codes, ti, ci] + tw * (1 - cw) * v[district_codes, ti + 1, ci]
+                   + (1 - tw) * cw * v[district_codes, ti, ci + 1] + tw * cw * v[district_codes, ti + 1, ci + 1])
+        return np.where(inside, np.expm1(log_rev), np.nan)
+
+    @property
+    def interpolation_ok(self) -> bool:
+        return self.error_report.get("p99_rel_error", np.inf) <= LUT_MAX_P99_ERROR
+
+    def on_grid(self, traffic: float, check: float):
+        """Grid indices if (traffic, check) is exactly a grid point, else None."""
+        ti = int(np.searchsorted(self.traffic_axis, traffic))
+        ci = int(np.searchsorted(self.check_axis, check))
+        if ti < len(self.traffic_axis) and ci < len(self.check_axis) \
+                and self.traffic_axis[ti] == traffic and self.check_axis[ci] == check:
+            return ti, ci
+        return None
+
+    def lookup(self, traffic: float, check: float, district_code: int):
+        """Scalar fast path for interactive predictions; None when the model should answer."""
+        exact = self.on_grid(traffic, check)
+        if exact is not None:
+            return float(np.expm1(self.log_revenue[district_code, exact[0], exact[1]]))
+        if not self.interpolation_ok:
+            return None
+        if not (self.traffic_axis[0] <= traffic <= self.traffic_axis[-1] and self.check_axis[0] <= check <= self.check_axis[-1]):
+            return None
+        return float(self.lookup_many(traffic, check, district_code)[0])
+
+    def lookup_rows(self, traffic, check, district_codes) -> np.ndarray:
+        """Vectorized ``lookup`` for batches: revenue per row, NaN where the model should answer."""
+        traffic = np.atleast_1d(np.asarray(traffic, dtype=np.float64))
+        check = np.atleast_1d(np.asarray(check, dtype=np.float64))
+        revenue = self.lookup_many(traffic, check, district_codes)
+        if not self.interpolation_ok:
+            # Grid points are exact (interpolation weights are 0 or 1); everything else goes to the model
+            on_grid = np.isin(traffic, self.traffic_axis) & np.isin(check, self.check_axis)
+            revenue = np.where(on_grid, revenue, np.nan)
+        return revenue
+
+    def measure_error(self, analyzer, n_samples: int = 20000, seed: int = 42) -> dict:
+        """Relative error of the table vs the model on random off-grid inputs (grid points themselves are exact up to float32)."""
+        rng = np.random.default_rng(seed)
+        n_districts = self.log_revenue.shape[0]
+        traffic = rng.uniform(self.traffic_axis[0], self.traffic_axis[-1], n_samples)
+        check = rng.uniform(self.check_axis[0], self.check_axis[-1], n_samples)
+        codes = rng.integers(0, n_districts, n_samples)
+        codes_to_name = {code: name for name, code in analyzer.district_mapping.items()}
+        expected = analyzer.predict_many({
+            "pedestrian_traffic": traffic,
+            "avg_purchase_value": check,
+            "district": [codes_to_name[c] for c in codes]
+        }, use_lut=False)["predicted_monthly_revenue"].to_numpy(dtype=np.float64)
+        rel_err = np.abs(self.lookup_many(traffic, check, codes) - expected) / np.maximum(np.abs(expected), 1.0)
+        return {
+            "n_samples": n_samples,
+            "mean_rel_error": float(rel_err.mean()),
+            "p99_rel_error": float(np.percentile(rel_err, 99)),
+            "max_rel_error": float(rel_err.max())
+        }
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path, log_revenue=self.log_revenue, traffic_axis=self.traffic_axis, check_axis=self.check_axis,
+            model_version=np.array(str(self.model_version or "")),
+            error=np.array([self.error_report.get(k, np.nan) for k in ("n_samples", "mean_rel_error", "p99_rel_error", "max_rel_error")])
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LocationLUT":
+        with np.load(path) as data:
+            n_samples, mean_err, p99_err, max_err = data["error"]
+            return cls(
+                data["log_revenue"], data["traffic_axis"], data["check_axis"],
+                model_version=str(data["model_version"]) or None,
+                error_report={"n_samples": int(n_samples), "mean_rel_error": float(mean_err),
+                              "p99_rel_error": float(p99_err), "max_rel_error": float(max_err)}
+            )
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# Optional dependencies: only needed when the ONNX engine is enabled
+try:
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    onnx = None
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+def _require(module, package: str):
+    if module is None:
+        raise ImportError(f"ONNX inference requires `pip install {package}`")
+
+
+def export_location_onnx(analyzer, path: str) -> str:
+    """Convert the fitted LocationAnalyzer pipeline to ONNX with the expm1 target inverse in-graph.
+
+    The graph takes a float32 ``features`` matrix in ``analyzer.feature_names``
+    order and outputs ``revenue`` in rubles, matching ``predict_many``. The
+    ai.onnx.ml Imputer only computes in float32, so the whole graph does too.
+    """
+    _require(onnx, "skl2onnx onnx")
+    if analyzer.model is None:
+        raise ValueError("LocationAnalyzer has no trained model to export")
+        
+    n_features = len(analyzer.feature_names)
+    model = convert_sklearn(
+        analyzer.model,
+        initial_types=[("features", FloatTensorType([None, n_features]))],
+        target_opset={"": 17, "ai.onnx.ml": 3}
+    )
+    
+    # The pipeline predicts log1p(revenue): append revenue = exp(y) - 1
+    graph = model.graph
+    log_output = graph.output[0].name
+    graph.initializer.extend([
+        numpy_helper.from_array(np.array(1.0, dtype=np.float32), name="one"),
+        numpy_helper.from_array(np.array([1], dtype=np.int64), name="squeeze_axes")
+    ])
+    graph.node.extend([
+        helper.make_node("Exp", [log_output], ["revenue_plus_one"], name="expm1_exp"),
+        helper.make_node("Sub", ["revenue_plus_one", "one"], ["revenue_2d"], name="expm1_sub"),
+        helper.make_node("Squeeze", ["revenue_2d", "squeeze_axes"], ["revenue"], name="revenue_squeeze")
+    ])
+    del graph.output[:]
+    graph.output.append(helper.make_tensor_value_info("revenue", TensorProto.FLOAT, [None]))
+    
+    onnx.helper.set_model_props(model, {
+        "feature_names": ",".join(analyzer.feature_names),
+        "model_version": str(analyzer.model_version or "")
+    })
+    onnx.checker.check_model(model)
+    with open(path, "wb") as f:
+        f.write(model.SerializeToString())
+    return path
+
+
+class OnnxLocationEngine:
+    """onnxruntime CPU session over an exported LocationAnalyzer pipeline."""
+
+    def __init__(self, path: str, intra_op_threads: int = 1):
+        _require(ort, "onnxruntime")
+        options = ort.SessionOptions()
+        # Single-row latency is best without thread pool handoffs
+        options.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.feature_names = meta.get("feature_names", "").split(",")
+        self.model_version = meta.get("model_version") or None
+
+    def predict_revenue(self, features) -> np.ndarray:
+        X = features.to_numpy(dtype=np.float32) if isinstance(features, pd.DataFrame) else np.asarray(features, dtype=np.float32)
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(X)})[0].astype(np.float64)
+
+
+def parity_check(analyzer, engine: OnnxLocationEngine, n_samples: int = 2000, rtol: float = 1e-3, seed: int = 42) -> dict:
+    """Compare ONNX and sklearn revenue on random inputs across the feature range."""
+    rng = np.random.default_rng(seed)
+    raw_df = pd.DataFrame({
+        "pedestrian_traffic": rng.uniform(0, 30000, n_samples),
+        "avg_purchase_value": rng.uniform(100, 15000, n_samples),
+        "district": rng.choice(list(analyzer.district_mapping), n_samples)
+    })
+    features_df = analyzer._prepare_features(raw_df)
+    expected = np.expm1(analyzer.model.predict(features_df))
+    actual = engine.predict_revenue(features_df)
+    
+    rel_err = np.abs(actual - expected) / np.maximum(np.abs(expected), 1.0)
+    return {
+        "n_samples": n_samples,
+        "max_abs_error_rub": float(np.max(np.abs(actual - expected))),
+        "max_rel_error": float(rel_err.max()),
+        "passed": bool(rel_err.max() <= rtol)
+    }
@@ -0,0 +1,229 @@
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from models.location_analyzer import LocationAnalyzer
+from models.demand_forecaster import DemandForecaster
+from models.client_segmenter import ClientSegmenter
+
+MODELS_DIR = os.getenv("MODELS_DIR", "models/saved_models")
+# Poll interval of the hot-swap watcher; 0 disables it
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", "30"))
+# "sklearn" or "onnx" (onnxruntime, exported next to the artifact on first load)
+LOCATION_INFERENCE_ENGINE = os.getenv("LOCATION_INFERENCE_ENGINE", "sklearn")
+# Serve interactive location predictions from a per-version lookup table
+LOCATION_LUT = os.getenv("LOCATION_LUT", "0") == "1"
+
+MODEL_CLASSES = {
+    "location_analyzer": LocationAnalyzer,
+    "demand_forecaster": DemandForecaster,
+    "client_segmenter": ClientSegmenter
+}
+
+_ARTIFACT_RE = re.compile(r"^(?P<name>[a-z_]+?)(?:_v(?P<version>[0-9A-Za-z.\-]+))?\.joblib$")
+
+def new_version() -> str:
+    """Sortable timestamp version for a freshly trained artifact."""
+    return datetime.now().strftime("%Y%m%d%H%M%S")
+
+def artifact_path(name: str, version: str = None, models_dir: str = MODELS_DIR) -> str:
+    """Path of a versioned artifact, e.g. models/saved_models/location_analyzer_v20261017120000.joblib."""
+    os.makedirs(models_dir, exist_ok=True)
+    return os.path.join(models_dir, f"{name}_v{version or new_version()}.joblib")
+
+def list_artifacts(name: str, models_dir: str = MODELS_DIR) -> list:
+    """(version, path) pairs for ``name`` sorted oldest to newest; an unversioned file counts as version "0"."""
+    if not os.path.isdir(models_dir):
+        return []
+    found = []
+    for filename in os.listdir(models_dir):
+        match = _ARTIFACT_RE.match(filename)
+        if match and match.group("name") == name:
+            found.append((match.group("version") or "0", os.path.join(models_dir, filename)))
+    return sorted(found, key=lambda item: (len(item[0]), item[0]))
+
+def latest_artifact(name: str, models_dir: str = MODELS_DIR):
+    artifacts = list_artifacts(name, models_dir)
+    return artifacts[-1] if artifacts else (None, None)
+
+def publish(instance, name: str, version: str = None, models_dir: str = MODELS_DIR) -> str:
+    """Save a trained model as a new versioned artifact, atomically so watchers never read a partial file."""
+    path = artifact_path(name, version, models_dir)
+    # Versions have one-second resolution; never overwrite one published moments ago (e.g. by a quick warm-start update)
+    while version is None and os.path.exists(path):
+        time.sleep(0.2)
+        path = artifact_path(name, None, models_dir)
+    tmp_path = path + ".tmp"
+    instance.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def warm_up(name: str, instance):
+    """Run one representative inference so first real requests skip lazy init costs.
+
+    Doubles as a smoke test: raises ValueError if the model produces non-finite output.
+    """
+    if name == "location_analyzer":
+        single = instance.predict(pedestrian_traffic=10000, avg_purchase_value=2500, district="central")
+        batch = instance.predict_many({"pedestrian_traffic": [5000.0, 15000.0], "avg_purchase_value": [1200.0, 3000.0]})
+        values = [single["predicted_monthly_revenue"]] + list(batch["predicted_monthly_revenue"])
+    elif name == "demand_forecaster":
+        forecast = instance.forecast(category="electronics", region="москва", months_ahead=12)
+        values = [m["predicted_volume"] for m in forecast["monthly_forecasts"]]
+    elif name == "client_segmenter":
+        segment = instance.segment_by_metrics(recency=30, frequency=5, monetary=1500000.0, company_size=10)
+        values = [segment["segment_id"], segment["clustering_confidence"]]
+    else:
+        values = []
+    if not all(math.isfinite(float(v)) for v in values):
+        raise ValueError(f"{name} smoke prediction returned non-finite values: {values}")
+
+class ModelRegistry:
+    """Loads versioned artifacts from the saved models directory and serves the live instances.
+
+    Until an artifact is found each model runs its heuristic fallback. Large
+    numpy arrays are memory-mapped read-only and every load is followed by a
+    warm-up inference, so request handlers never pay deserialization costs.
+    """
+
+    def __init__(self, models_dir: str = MODELS_DIR, mmap_mode: str = "r", location_engine: str = LOCATION_INFERENCE_ENGINE,
+                 location_lut: bool = LOCATION_LUT):
+        self.models_dir = models_dir
+        self.mmap_mode = mmap_mode
+        self.location_engine = location_engine
+        self.location_lut = location_lut
+        self._lock = threading.Lock()
+        self._models = {name: cls() for name, cls in MODEL_CLASSES.items()}
+        self._info = {name: {"version": None, "engine": None, "lut": None, "path": None, "loaded_at": None, "load_ms": None, "warm_up_ms": None}
+                      for name in MODEL_CLASSES}
+        self.loaded = False
+
+    def get(self, name: str):
+        return self._models[name]
+
+    def load_artifact(self, name: str, path: str, version: str = None):
+        """Deserialize and warm up an artifact without touching the live instance."""
+        instance = MODEL_CLASSES[name]()
+        started = time.perf_counter()
+        instance.load(path, mmap_mode=self.mmap_mode)
+        instance.model_version = version
+        engine = "sklearn" if name == "location_analyzer" else None
+        if engine and self.location_engine == "onnx":
+            try:
+                if instance.enable_onnx(os.path.splitext(path)[0] + ".onnx")["passed"]:
+                    engine = "onnx"
+            except Exception as e:
+                print(f"[ModelRegistry] ONNX engine unavailable for {path}: {e}")
+        lut = None
+        if engine and self.location_lut:
+            # The table file is keyed by artifact, so every new version gets its own rebuild
+            try:
+                lut = instance.enable_lut(os.path.splitext(path)[0] + ".lut.npz")
+            except Exception as e:
+                print(f"[ModelRegistry] Lookup table unavailable for {path}: {e}")
+        loaded = time.perf_counter()
+        warm_up(name, instance)
+        info = {
+            "version": version,
+            "engine": engine,
+            "lut": lut,
+            "path": path,
+            "loaded_at": datetime.now().isoformat(timespec="seconds"),
+            "load_ms": round((loaded - started) * 1000, 1),
+            "warm_up_ms": round((time.perf_counter() - loaded) * 1000, 1)
+        }
+        return instance, info
+
+    def install(self, name: str, instance, info: dict):
+        with self._lock:
+            self._models[name] = instance
+            self._info[name] = info
+
+    def load_latest(self, name: str) -> bool:
+        version, path = latest_artifact(name, self.models_dir)
+        if path is None:
+            warm_up(name, self._models[name])
+            return False
+        try:
+            instance, info = self.load_artifact(name, path, version)
+        except Exception as e:
+            print(f"[ModelRegistry] Failed to load {path}: {e}")
+            return False
+        self.install(name, instance, info)
+        print(f"[ModelRegistry] Loaded {name} v{version} ({info['load_ms']} ms load, {info['warm_up_ms']} ms warm-up)")
+        return True
+
+    def load_all(self):
+        for name in MODEL_CLASSES:
+            self.load_latest(name)
+        self.loaded = True
+        return self
+
+    def versions(self) -> dict:
+        with self._lock:
+            return {
+                name: dict(info, mode="artifact" if info["version"] is not None else "heuristic_fallback")
+                for name, info in self._info.items()
+            }
+
+class ArtifactWatcher:
+    """Background hot swap of retrained models.
+
+    Polls the saved models directory; when a newer artifact appears it is
+    loaded and smoke-tested on this thread, then installed with a single
+    reference swap. Requests keep using the previous instance until then, and
+    an artifact that fails validation is skipped until a newer one appears.
+    """
+
+    def __init__(self, registry: ModelRegistry, interval_seconds: float = MODEL_WATCH_INTERVAL_SECONDS, min_age_seconds: float = 2.0):
+        self.registry = registry
+        self.interval_seconds = interval_seconds
+        self.min_age_seconds = min_age_seconds
+        self._rejected = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check_once(self) -> list:
+        """Swap in any newer artifacts; returns the names that were updated."""
+        swapped = []
+        for name in MODEL_CLASSES:
+            version, path = latest_artifact(name, self.registry.models_dir)
+            if path is None or path in self._rejected:
+                continue
+            if version == self.registry.versions()[name]["version"]:
+                continue
+            # Skip files that may still be being copied into place
+            if time.time() - os.path.getmtime(path) < self.min_age_seconds:
+                continue
+            try:
+                instance, info = self.registry.load_artifact(name, path, version)
+            except Exception as e:
+                print(f"[ArtifactWatcher] Rejected {path}: {e}")
+                self._rejected.add(path)
+                continue
+            self.registry.install(name, instance, info)
+            swapped.append(name)
+            print(f"[ArtifactWatcher] Hot-swapped {name} -> v{version}")
+        return swapped
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.check_once()
+            except Exception as e:
+                print(f"[ArtifactWatcher] Poll failed: {e}")
+
+    def start(self):
+        if self._thread is None and self.interval_seconds > 0:
+            self._thread = threading.Thread(target=self._run, name="model-artifact-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,270 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from utils.geo import EARTH_RADIUS_M
+from utils.local_poi_index import load_local_poi_index
+from utils.overpass_provider import POI_LOCAL_PATH
+from utils.poi_raster import POITrafficRaster
+
+REVENUE_HEATMAP_PATH = os.getenv("REVENUE_HEATMAP_PATH", "cache/revenue_heatmap.npz")
+HEATMAP_CELL_M = 250.0
+HEATMAP_RADIUS_M = 500
+HEATMAP_CHECK_LEVELS = (500, 1000, 1500, 2500, 4000, 6000, 10000)
+
+# City bounding boxes (lat_min, lat_max, lon_min, lon_max) and display names
+HEATMAP_CITIES = {
+    "moscow": {"name": "Москва", "bbox": (55.55, 55.92, 37.35, 37.85)},
+    "saint_petersburg": {"name": "Санкт-Петербург", "bbox": (59.80, 60.05, 30.15, 30.55)},
+    "yekaterinburg": {"name": "Екатеринбург", "bbox": (56.75, 56.92, 60.45, 60.75)}
+}
+
+_METERS_PER_DEG_LAT = np.pi * EARTH_RADIUS_M / 180.0
+
+# Transparent -> blue -> yellow -> red ramp for revenue relative to the city's 99th percentile
+_RAMP_STOPS = np.array([0.0, 0.35, 0.7, 1.0])
+_RAMP_RGBA = np.array([
+    [30, 64, 175, 90],
+    [59, 130, 246, 140],
+    [245, 158, 11, 170],
+    [239, 68, 68, 200]
+], dtype=np.float64)
+_COLORMAP = np.stack(
+    [np.interp(np.linspace(0.0, 1.0, 256), _RAMP_STOPS, _RAMP_RGBA[:, ch]) for ch in range(4)], axis=1
+).astype(np.uint8)
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Minimal RGBA PNG encoder (zlib only), so tile serving needs no imaging library."""
+    height, width = rgba.shape[:2]
+    # Every scanline starts with filter type 0 (None)
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)], axis=1)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b"")
+
+
+def _grid_geometry(bbox: tuple, cell_m: float):
+    lat_min, lat_max, lon_min, lon_max = bbox
+    dlat = cell_m / _METERS_PER_DEG_LAT
+    dlon = cell_m / (_METERS_PER_DEG_LAT * np.cos(np.radians((lat_min + lat_max) / 2.0)))
+    n_rows = int(np.ceil((lat_max - lat_min) / dlat))
+    n_cols = int(np.ceil((lon_max - lon_min) / dlon))
+    return lat_min, lon_min, dlat, dlon, n_rows, n_cols
+
+
+def build_city_heatmap(analyzer, raster: POITrafficRaster, bbox: tuple, cell_m: float = HEATMAP_CELL_M,
+                       check_levels=HEATMAP_CHECK_LEVELS, radius: int = HEATMAP_RADIUS_M) -> dict:
+    """Score every grid cell center of ``bbox`` at each average check level in one predict_many call."""
+    lat0, lon0, dlat, dlon, n_rows, n_cols = _grid_geometry(bbox, cell_m)
+    cell_lat = lat0 + (np.arange(n_rows) + 0.5) * dlat
+    cell_lon = lon0 + (np.arange(n_cols) + 0.5) * dlon
+    lat_grid, lon_grid = np.meshgrid(cell_lat, cell_lon, indexing="ij")
+
+    traffic = raster.traffic_score(lat_grid.ravel(), lon_grid.ravel(), radius).astype(np.float64)
+    checks = np.asarray(check_levels, dtype=np.float64)
+    scored = analyzer.predict_many({
+        "pedestrian_traffic": np.tile(traffic, len(checks)),
+        "avg_purchase_value": np.repeat(checks, len(traffic)),
+        "district": "central"
+    })
+    revenue = scored["predicted_monthly_revenue"].to_numpy(dtype=np.float32).reshape(len(checks), n_rows, n_cols)
+    return {
+        "revenue": revenue,
+        "traffic": traffic.reshape(n_rows, n_cols).astype(np.float32),
+        "origin": np.array([lat0, lon0, dlat, dlon])
+    }
+
+
+def build_heatmaps(analyzer, poi_path: str = POI_LOCAL_PATH, out_path: str = REVENUE_HEATMAP_PATH, cities=None,
+                   cell_m: float = HEATMAP_CELL_M, check_levels=HEATMAP_CHECK_LEVELS, radius: int = HEATMAP_RADIUS_M) -> str:
+    """Batch job: evaluate the location model over every supported city and store one compressed .npz."""
+    index = load_local_poi_index(poi_path)
+    arrays = {"check_levels": np.asarray(check_levels, dtype=np.float64)}
+    for city in cities or HEATMAP_CITIES:
+        bbox = HEATMAP_CITIES[city]["bbox"]
+        # 50 m POI raster with a margin so border cells see their full radius
+        margin_lat = radius / _METERS_PER_DEG_LAT
+        margin_lon = margin_lat / np.cos(np.radians((bbox[0] + bbox[1]) / 2.0))
+        raster = POITrafficRaster.from_local_index(
+            index, bbox=(bbox[0] - margin_lat, bbox[1] + margin_lat, bbox[2] - margin_lon, bbox[3] + margin_lon)
+        )
+        grid = build_city_heatmap(analyzer, raster, bbox, cell_m, check_levels, radius)
+        for key, value in grid.items():
+            arrays[f"{city}__{key}"] = value
+        print(f"[RevenueHeatmap] {city}: {grid['traffic'].shape[0]}x{grid['traffic'].shape[1]} cells x {len(check_levels)} check levels")
+
+    arrays["meta"] = np.array(json.dumps({
+        "model_version": analyzer.model_version,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "cell_m": cell_m,
+        "radius_m": radius,
+        "poi_source": poi_path
+    }))
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp.npz"
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class RevenueHeatmap:
+    """Precomputed revenue grids per city, served as XYZ map tiles and top-k cells.
+
+    Revenue between stored average check levels is interpolated linearly,
+    so any check requested by a client is answered without running the model.
+    """
+
+    def __init__(self, arrays: dict):
+        self.check_levels = arrays["check_levels"]
+        self.meta = json.loads(str(arrays["meta"]))
+        self.grids = {}
+        for city in HEATMAP_CITIES:
+            if f"{city}__revenue" in arrays:
+                revenue = arrays[f"{city}__revenue"]
+                self.grids[city] = {
+                    "revenue": revenue,
+                    "traffic": arrays[f"{city}__traffic"],
+                    "origin": arrays[f"{city}__origin"],
+                    # Fixed color scale per check level so neighbouring tiles match
+                    "vmax": np.percentile(revenue.reshape(len(revenue), -1), 99, axis=1)
+                }
+
+    @classmethod
+    def load(cls, path: str = REVENUE_HEATMAP_PATH) -> "RevenueHeatmap":
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def cities(self) -> dict:
+        return {
+            city: {
+                "name": HEATMAP_CITIES[city]["name"],
+                "bbox": HEATMAP_CITIES[city]["bbox"],
+                "shape": list(grid["traffic"].shape)
+            }
+            for city, grid in self.grids.items()
+        }
+
+    def _grid(self, city: str) -> dict:
+        if city not in self.grids:
+            raise KeyError(f"No heatmap for city '{city}', available: {sorted(self.grids)}")
+        return self.grids[city]
+
+    def _check_weights(self, avg_check: float):
+        levels = self.check_levels
+        check = float(np.clip(avg_check, levels[0], levels[-1]))
+        hi = min(int(np.searchsorted(levels, check)), len(levels) - 1)
+        lo = max(hi - 1, 0)
+        w = 0.0 if hi == lo else (check - levels[lo]) / (levels[hi] - levels[lo])
+        return lo, hi, w
+
+    def revenue_grid(self, city: str, avg_check: float) -> np.ndarray:
+        grid = self._grid(city)
+        lo, hi, w = self._check_weights(avg_check)
+        return (1.0 - w) * grid["revenue"][lo] + w * grid["revenue"][hi]
+
+    def _vmax(self, city: str, avg_check: float) -> float:
+        lo, hi, w = self._check_weights(avg_check)
+        vmax = self._grid(city)["vmax"]
+        return float((1.0 - w) * vmax[lo] + w * vmax[hi])
+
+    def colorize(self, revenue: np.ndarray, vmax: float) -> np.ndarray:
+        """RGBA uint8 image of revenue relative to ``vmax``; NaN cells are transparent."""
+        valid = np.isfinite(revenue)
+        level = np.clip(np.nan_to_num(revenue / max(vmax, 1.0)) * 255, 0, 255).astype(np.uint8)
+        rgba = _COLORMAP[level]
+        rgba[~valid] = 0
+        return rgba
+
+    def overlay_image(self, city: str, avg_check: float):
+        """Whole-city RGBA image (north up) and its [[south, west], [north, east]] bounds for map overlays."""
+        grid = self._grid(city)
+        lat0, lon0, dlat, dlon = grid["origin"]
+        n_rows, n_cols = grid["traffic"].shape
+        image = self.colorize(self.revenue_grid(city, avg_check), self._vmax(city, avg_check))[::-1]
+        return image, [[float(lat0), float(lon0)], [float(lat0 + n_rows * dlat), float(lon0 + n_cols * dlon)]]
+
+    def tile_rgba(self, city: str, avg_check: float, z: int, x: int, y: int, size: int = 256) -> np.ndarray:
+        """Render web-mercator tile z/x/y by nearest-cell sampling of the revenue grid."""
+        grid = self._grid(city)
+        lat0, lon0, dlat, dlon = grid["origin"]
+        n_rows, n_cols = grid["traffic"].shape
+
+        n = 2.0 ** z
+        pixel = (np.arange(size) + 0.5) / size
+        lon = (x + pixel) / n * 360.0 - 180.0
+        lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y + pixel) / n))))
+        rows = np.floor((lat - lat0) / dlat).astype(np.int64)
+        cols = np.floor((lon - lon0) / dlon).astype(np.int64)
+        row_ok = (rows >= 0) & (rows < n_rows)
+        col_ok = (cols >= 0) & (cols < n_cols)
+        if not row_ok.any() or not col_ok.any():
+            return np.zeros((size, size, 4), dtype=np.uint8)
+
+        revenue = self.revenue_grid(city, avg_check)
+        sampled = revenue[np.clip(rows, 0, n_rows - 1)[:, None], np.clip(cols, 0, n_cols - 1)[None, :]]
+        sampled = np.where(row_ok[:, None] & col_ok[None, :], sampled, np.nan)
+        return self.colorize(sampled, self._vmax(city, avg_check))
+
+    def tile_png(self, city: str, avg_check: float, z: int, x: int, y: int) -> bytes:
+        return encode_png(self.tile_rgba(city, avg_check, z, x, y))
+
+    def top_cells(self, city: str, avg_check: float, k: int = 20) -> list:
+        """The k highest-revenue cells with their center coordinates."""
+        grid = self._grid(city)
+        lat0, lon0, dlat, dlon = grid["origin"]
+        revenue = self.revenue_grid(city, avg_check).ravel()
+        k = min(k, revenue.size)
+        best = np.argpartition(revenue, revenue.size - k)[-k:]
+        best = best[np.argsort(revenue[best])[::-1]]
+        rows, cols = np.unravel_index(best, grid["traffic"].shape)
+        return [{
+            "lat": round(float(lat0 + (r + 0.5) * dlat), 6),
+            "lon": round(float(lon0 + (c + 0.5) * dlon), 6),
+            "predicted_monthly_revenue": round(float(revenue[i]), 2),
+            "traffic_score": float(grid["traffic"][r, c])
+        } for i, r, c in zip(best, rows, cols)]
+
+
+# API workers and Streamlit reruns share one loaded heatmap; a rebuilt file is picked up by mtime
+_heatmaps = {}
+_heatmaps_lock = threading.Lock()
+
+def load_revenue_heatmap(path: str = REVENUE_HEATMAP_PATH):
+    """Current heatmap at ``path``, reloaded when the file changes; None if it has not been built."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    key = os.path.abspath(path)
+    with _heatmaps_lock:
+        cached = _heatmaps.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, RevenueHeatmap.load(path))
+            _heatmaps[key] = cached
+        return cached[1]
+
+if __name__ == "__main__":
+    import argparse
+    from models.registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Precompute city revenue heatmaps for the location model")
+    parser.add_argument("--pois", default=POI_LOCAL_PATH, help="local POI extract (.osm.pbf, .npz or Overpass JSON)")
+    parser.add_argument("--out", default=REVENUE_HEATMAP_PATH)
+    parser.add_argument("--cities", default=",".join(HEATMAP_CITIES))
+    parser.add_argument("--cell-m", type=float, default=HEATMAP_CELL_M)
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    registry.load_latest("location_analyzer")
+    path = build_heatmaps(registry.get("location_analyzer"), args.pois, args.out, args.cities.split(","), args.cell_m)
+    print(f"Saved revenue heatmaps to {path}")
@@ -7,9 +7,12 @@ from utils.data_preprocessing import (
     load_and_preprocess_demand_data,
     load_and_preprocess_segmentation_data
 )
-from models.location_analyzer import LocationAnalyzer
+from models.location_analyzer import LocationAnalyzer, LOCATION_TRAIN_ENGINE, LOCATION_TRAIN_ENGINES
 from models.demand_forecaster import DemandForecaster
+from models.demand_backtest import run_backtest
 from models.client_segmenter import ClientSegmenter
+from models.registry import ModelRegistry, publish, latest_artifact
+import argparse
 import time
 import traceback
 
@@ -25,9 +28,9 @@ def create_directories():
         os.makedirs(directory, exist_ok=True)
         print(f"✅ Директория создана: {directory}")
 
-def train_location_model():
+def train_location_model(engine=LOCATION_TRAIN_ENGINE, tune=False):
     """Обучение модели анализа локаций"""
-    print("\n🚀 Обучение модели анализа локаций...")
+    print(f"\n🚀 Обучение модели анализа локаций (движок: {engine})...")
     
     try:
         # Загрузка и предобработка данных
@@ -38,14 +41,18 @@ def train_location_model():
         print(f"Загружено {len(X)} записей для обучения")
         print(f"Признаки: {features}")
         
-        # Обучение модели
+        # Подбор гиперпараметров (successive halving) и обучение модели
         analyzer = LocationAnalyzer()
-        r2 = analyzer.train(X, y, features)
+        tuning = analyzer.tune(X, y, engine=engine) if tune else None
+        metrics = analyzer.train(X, y, features, engine=engine, params=tuning['params'] if tuning else None)
         
-        # Сохранение модели
-        analyzer.save_model()
+        # Сохранение версионированного артефакта и лучшей конфигурации рядом с ним
+        path = publish(analyzer, 'location_analyzer')
+        if tuning:
+            tuning['holdout_metrics'] = {key: float(metrics[key]) for key in ('r2', 'mae', 'rmse')}
+            print(f"Лучшая конфигурация: {LocationAnalyzer.save_params(tuning, path)}")
         
-        print(f"✅ Модель анализа локаций обучена. R² = {r2:.3f}")
+        print(f"✅ Модель анализа локаций обучена. R² = {metrics['r2']:.3f} -> {path}")
         return True
         
     except Exception as e:
@@ -53,7 +60,68 @@ def train_location_model():
         print(f"Подробности ошибки: {traceback.format_exc()}")
         return False
 
-def train_demand_model():
+def update_location_model(new_data_path, recent_rows=20000, n_new_trees=50):
+    """Дообучение (warm start) последней версии модели локаций на новых наблюдениях"""
+    print(f"\n🔁 Дообучение модели анализа локаций на {new_data_path}...")
+    
+    try:
+        version, path = latest_artifact('location_analyzer')
+        if path is None:
+            print("❌ Нет обученной модели локаций, сначала выполните полное обучение")
+            return False
+        
+        analyzer = LocationAnalyzer()
+        analyzer.load(path)
+        analyzer.model_version = version
+        
+        X_new, y_new, _ = load_and_preprocess_locations_data(new_data_path)
+        # Последние записи основной выборки удерживают модель от переобучения на свежем срезе
+        X_recent, y_recent = None, None
+        if recent_rows > 0 and os.path.exists('data/synthetic/locations_data.json'):
+            X_all, y_all, _ = load_and_preprocess_locations_data('data/synthetic/locations_data.json')
+            X_recent, y_recent = X_all.tail(recent_rows), y_all.tail(recent_rows)
+        
+        print(f"Новых записей: {len(X_new)}, недавних: {len(X_recent) if X_recent is not None else 0}, базовая версия: v{version}")
+        metrics = analyzer.update(X_new, y_new, X_recent, y_recent, n_new_trees=n_new_trees)
+        if not metrics['applied']:
+            print(f"❌ Дообучение ухудшило точность на новых данных (RMSE {metrics['before']['rmse']:,.0f} -> "
+                  f"{metrics['after']['rmse']:,.0f}), новая версия не публикуется")
+            return False
+        
+        new_path = publish(analyzer, 'location_analyzer')
+        print(f"✅ Модель дообучена (+{metrics['n_trees_added']} деревьев, {metrics['update_seconds']:.1f} с). R² = {metrics['after']['r2']:.3f} -> {new_path}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка при дообучении модели анализа локаций: {e}")
+        print(f"Подробности ошибки: {traceback.format_exc()}")
+        return False
+
+def benchmark_location_engines(engines=LOCATION_TRAIN_ENGINES):
+    """Сравнение движков обучения модели локаций: время и точность на одних данных"""
+    print("\n⏱️  Сравнение движков обучения модели анализа локаций...")
+    
+    X, y, features = load_and_preprocess_locations_data(
+        'data/synthetic/locations_data.json'
+    )
+    print(f"Загружено {len(X)} записей")
+    
+    results = []
+    for engine in engines:
+        metrics = LocationAnalyzer().train(X, y, features, engine=engine)
+        results.append({key: metrics[key] for key in ('engine', 'train_seconds', 'n_trees', 'r2', 'mae', 'rmse')})
+    
+    print(f"\n{'Движок':<10} {'Время, с':>10} {'Деревьев':>9} {'R²':>8} {'MAE, руб':>14} {'RMSE, руб':>14}")
+    for r in results:
+        print(f"{r['engine']:<10} {r['train_seconds']:>10.1f} {r['n_trees']:>9} {r['r2']:>8.4f} {r['mae']:>14.0f} {r['rmse']:>14.0f}")
+    
+    os.makedirs('reports', exist_ok=True)
+    with open('reports/location_engine_benchmark.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print("✅ Результаты сохранены в reports/location_engine_benchmark.json")
+    return results
+
+def train_demand_model(n_workers=None):
     """Обучение модели прогноза спроса"""
     print("\n🚀 Обучение модели прогноза спроса...")
     
@@ -66,24 +134,42 @@ def train_demand_model():
         print(f"Загружено {len(df)} записей для обучения")
         print(f"Уникальные категории: {df['category'].unique()}")
         
-        # Обучение модели
+        # Обучение моделей по категориям в параллельных процессах (LightGBM на лаговых признаках)
         forecaster = DemandForecaster()
-        success = forecaster.train(X, y, features, df)
+        metrics = forecaster.train(df, n_workers=n_workers)
+        for category, m in metrics['categories'].items():
+            print(f"  {category:<12} MAPE = {m['mape']:.2%}, деревьев: {m['n_trees']}, {m['train_seconds']:.1f} с")
         
-        if success:
-            # Сохранение моделей
-            forecaster.save_models()
-            print("✅ Модель прогноза спроса обучена и сохранена")
-            return True
-        else:
-            print("❌ Не удалось обучить модель прогноза спроса")
-            return False
+        # Rolling-origin бэктест: реальные MAPE/покрытие вместо справочных цифр, сохраняются в артефакте
+        forecaster.backtest = backtest_demand_model(forecaster, df, n_workers)
+        
+        # Сохранение версионированного артефакта
+        path = publish(forecaster, 'demand_forecaster')
+        print(f"✅ Модель прогноза спроса обучена. MAPE = {metrics['mape']:.2%} -> {path}")
+        return True
             
     except Exception as e:
         print(f"❌ Ошибка при обучении модели прогноза спроса: {e}")
         print(f"Подробности ошибки: {traceback.format_exc()}")
         return False
 
+def backtest_demand_model(forecaster, df, n_workers=None):
+    """Rolling-origin бэктест модели спроса по всем рядам регион × категория"""
+    print("\n🧪 Бэктест модели прогноза спроса (rolling origin)...")
+    report = run_backtest(df, forecaster, n_workers=n_workers)
+    print(f"Фолдов: {len(report['folds'])}, процессов: {report['workers']}, время: {report['wall_seconds']:.1f} с")
+    print(f"MAPE = {report['mape']:.2%}, MAE = {report['mae']:,.0f}, покрытие интервала = {report['coverage']:.1%}")
+    for category, metrics in report['categories'].items():
+        if metrics['bound_margin'] is not None:
+            print(f"  {category}: ширина интервала ±{metrics['bound_margin']:.1%} "
+                  f"(покрытие {metrics['calibrated_coverage']:.1%} при цели {report['band_coverage_target']:.0%})")
+    
+    os.makedirs('reports', exist_ok=True)
+    with open('reports/demand_backtest.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("✅ Результаты сохранены в reports/demand_backtest.json")
+    return report
+
 def train_segmentation_model():
     """Обучение модели сегментации клиентов"""
     print("\n🚀 Обучение модели сегментации клиентов...")
@@ -105,19 +191,12 @@ def train_segmentation_model():
         
         # Обучение модели
         segmenter = ClientSegmenter()
-        success = segmenter.train(X, y, features, segment_mapping)
+        segmenter.train(X, features)
         
-        if success:
-            # Сохранение моделей
-            if segmenter.save_models():
-                print("✅ Модель сегментации клиентов обучена и сохранена")
-                return True
-            else:
-                print("❌ Не удалось сохранить модель сегментации клиентов")
-                return False
-        else:
-            print("❌ Не удалось обучить модель сегментации клиентов")
-            return False
+        # Сохранение версионированного артефакта
+        path = publish(segmenter, 'client_segmenter')
+        print(f"✅ Модель сегментации клиентов обучена и сохранена -> {path}")
+        return True
             
     except Exception as e:
         print(f"❌ Ошибка при обучении модели сегментации клиентов: {e}")
@@ -129,8 +208,10 @@ def generate_sample_predictions():
     print("\n📊 Генерация примеров предсказаний...")
     
     try:
+        registry = ModelRegistry().load_all()
+        
         # 1. Пример для анализа локации
-        location_analyzer = LocationAnalyzer.load_model()
+        location_analyzer = registry.get('location_analyzer')
         location_pred = location_analyzer.predict(
             pedestrian_traffic=12500,
             avg_purchase_value=1200,
@@ -140,23 +221,23 @@ def generate_sample_predictions():
         print("✅ Пример для анализа локации сгенерирован")
         
         # 2. Пример для прогноза спроса
-        demand_forecaster = DemandForecaster.load_models()
-        demand_pred = demand_forecaster.predict(
+        demand_forecaster = registry.get('demand_forecaster')
+        demand_pred = demand_forecaster.forecast(
             category='electronics',
-            region='REG_MSK',
-            economic_index=105.0
+            region='москва',
+            months_ahead=3
         )
         
         print("✅ Пример для прогноза спроса сгенерирован")
         
         # 3. Пример для сегментации клиента
-        client_segmenter = ClientSegmenter.load_models()
-        if hasattr(client_segmenter, 'classifier') and client_segmenter.classifier is not None:
-            segment_pred = client_segmenter.predict_segment(
+        client_segmenter = registry.get('client_segmenter')
+        if client_segmenter.model is not None:
+            segment_pred = client_segmenter.segment_by_metrics(
                 recency=15,
                 frequency=12,
                 monetary=5000000,
-                company_size='medium'
+                company_size=1
             )
             print("✅ Пример для сегментации клиента сгенерирован")
         else:
@@ -189,7 +270,7 @@ def generate_sample_predictions():
         print(f"Подробности ошибки: {traceback.format_exc()}")
         return False
 
-def main():
+def main(location_engine=LOCATION_TRAIN_ENGINE, tune_location=False, demand_workers=None):
     """Основная функция обучения всех моделей"""
     start_time = time.time()
     
@@ -220,10 +301,10 @@ def main():
     # Обучение моделей
     success_count = 0
     
-    if train_location_model():
+    if train_location_model(location_engine, tune_location):
         success_count += 1
     
-    if train_demand_model():
+    if train_demand_model(demand_workers):
         success_count += 1
     
     if train_segmentation_model():
@@ -254,4 +335,26 @@ def main():
         print("Для повторного обучения выполните: python train_models.py")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Обучение моделей MVP")
+    parser.add_argument("--location-engine", choices=LOCATION_TRAIN_ENGINES, default=LOCATION_TRAIN_ENGINE,
+                        help="движок обучения модели локаций: gbr (точный, 1 ядро), hist или lightgbm (гистограммные, многопоточные)")
+    parser.add_argument("--tune-location", action="store_true",
+                        help="подобрать гиперпараметры модели локаций (HalvingRandomSearchCV) перед обучением")
+    parser.add_argument("--update-location", metavar="NEW_DATA_JSON",
+                        help="дообучить последнюю модель локаций (warm start) на новых наблюдениях вместо полного обучения")
+    parser.add_argument("--recent-rows", type=int, default=20000,
+                        help="сколько последних записей основной выборки добавить к новым при дообучении")
+    parser.add_argument("--new-trees", type=int, default=50,
+                        help="сколько деревьев добавить при дообучении")
+    parser.add_argument("--benchmark-location", action="store_true",
+                        help="только сравнить движки обучения модели локаций по времени и точности")
+    parser.add_argument("--demand-workers", type=int, default=None,
+                        help="число процессов для обучения моделей спроса по категориям (по умолчанию — по числу ядер)")
+    args = parser.parse_args()
+    
+    if args.update_location:
+        update_location_model(args.update_location, args.recent_rows, args.new_trees)
+    elif args.benchmark_location:
+        benchmark_location_engines()
+    else:
+        main(args.location_engine, args.tune_location, args.demand_workers)
\ No newline at end of file
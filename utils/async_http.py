@@ -0,0 +1,139 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import weakref
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "256"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "64"))
+
+# httpx connection pools are bound to the event loop that created them,
+# so one shared client is kept per running loop.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared pooled AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE
+            ),
+            follow_redirects=True
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the shared client of the running loop (call on app shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class LoopSemaphore:
+    """``async with`` concurrency limit that keeps one asyncio.Semaphore per running loop.
+
+    A plain Semaphore binds to the first loop that waits on it, which breaks
+    module-level providers shared by the API loop and the private loops of
+    ``iter_async_in_thread``. Like the pooled clients, each loop gets its own.
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _get(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.value)
+            return semaphore
+
+    async def __aenter__(self):
+        await self._get().acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._get().release()
+
+
+class AsyncRateLimiter:
+    """Token bucket limiting how many upstream calls start per second."""
+
+    def __init__(self, rate_per_second: float, burst: int = None):
+        self.rate = float(rate_per_second)
+        self.capacity = float(burst or max(1, int(rate_per_second)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+_DONE = object()
+
+
+class _ThreadError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iter_async_in_thread(agen_factory):
+    """Drive an async generator on a private event loop thread and yield its items synchronously.
+
+    Lets plain Python callers consume async bulk pipelines as a regular
+    generator; closing the generator early stops the background loop.
+    """
+    items = queue.Queue()
+    stop = threading.Event()
+
+    async def drain():
+        agen = agen_factory()
+        try:
+            async for item in agen:
+                items.put(item)
+                if stop.is_set():
+                    break
+        finally:
+            await agen.aclose()
+            await close_async_client()
+
+    def runner():
+        try:
+            asyncio.run(drain())
+        except BaseException as e:
+            items.put(_ThreadError(e))
+        finally:
+            items.put(_DONE)
+
+    thread = threading.Thread(target=runner, name="async-bulk-iterator", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _ThreadError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
@@ -1,70 +1,84 @@
+import asyncio
 import os
+import random
 import requests
 
+from utils.async_http import AsyncRateLimiter, LoopSemaphore, get_async_client, iter_async_in_thread
+from utils.sqlite_cache import SQLiteTTLCache
+
 DADATA_API_KEY = os.getenv("DADATA_API_KEY", "225939c9f990c2e2e9e7483e29a066e3ea06e8a9")
 DADATA_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/findById/party"
+DADATA_MAX_CONCURRENCY = int(os.getenv("DADATA_MAX_CONCURRENCY", "64"))
+# Empty DADATA_CACHE_PATH disables the persistent enrichment cache
+DADATA_CACHE_PATH = os.getenv("DADATA_CACHE_PATH", "cache/dadata.sqlite")
+DADATA_CACHE_TTL_SECONDS = int(os.getenv("DADATA_CACHE_TTL_SECONDS", str(30 * 86400)))
+DADATA_NEGATIVE_TTL_SECONDS = int(os.getenv("DADATA_NEGATIVE_TTL_SECONDS", "3600"))
+DADATA_BULK_CONCURRENCY = int(os.getenv("DADATA_BULK_CONCURRENCY", "20"))
+DADATA_BULK_RATE_LIMIT = float(os.getenv("DADATA_BULK_RATE_LIMIT", "20"))
+DADATA_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
 
 class DaDataClient:
     """Client for DaData.ru API to enrich B2B client data by INN or company name."""
     
-    def __init__(self, api_key: str = DADATA_API_KEY):
+    def __init__(self, api_key: str = DADATA_API_KEY, max_concurrency: int = DADATA_MAX_CONCURRENCY,
+                 cache_path: str = DADATA_CACHE_PATH, cache_ttl_seconds: int = DADATA_CACHE_TTL_SECONDS,
+                 negative_ttl_seconds: int = DADATA_NEGATIVE_TTL_SECONDS):
         self.api_key = api_key
         self.headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
             "Authorization": f"Token {self.api_key}"
         }
+        self._semaphore = LoopSemaphore(max_concurrency)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.cache = SQLiteTTLCache(cache_path, table="dadata_party", ttl_seconds=cache_ttl_seconds) if cache_path else None
 
-    def get_company_by_inn(self, query: str) -> dict:
-        """Fetch company details from DaData by INN or name."""
-        payload = {"query": query.strip()}
-        try:
-            resp = requests.post(DADATA_URL, json=payload, headers=self.headers, timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
-                suggestions = data.get("suggestions", [])
-                if suggestions:
-                    party = suggestions[0]
-                    p_data = party.get("data", {})
-                    
-                    finance = p_data.get("finance", {}) or {}
-                    revenue = finance.get("revenue") or 0
-                    profit = finance.get("net_income") or 0
-                    
-                    employee_count = p_data.get("employee_count") or 1
-                    
-                    okved = p_data.get("okved") or ""
-                    okved_type = p_data.get("okved_type") or ""
-                    
-                    state = p_data.get("state", {})
-                    registration_date = state.get("registration_date")
-                    company_age_years = 3.0
-                    if registration_date:
-                        import time
-                        reg_ts = int(registration_date) / 1000.0
-                        now_ts = time.time()
-                        company_age_years = round((now_ts - reg_ts) / (365.25 * 86400), 1)
-
-                    return {
-                        "status": "success",
-                        "inn": p_data.get("inn", query),
-                        "kpp": p_data.get("kpp", ""),
-                        "ogrn": p_data.get("ogrn", ""),
-                        "name": party.get("value", ""),
-                        "short_name": p_data.get("name", {}).get("short_with_opf", ""),
-                        "address": p_data.get("address", {}).get("value", ""),
-                        "okved": okved,
-                        "okved_type": okved_type,
-                        "employee_count": employee_count,
-                        "revenue": revenue,
-                        "profit": profit,
-                        "company_age_years": company_age_years,
-                        "management_name": p_data.get("management", {}).get("name", ""),
-                        "raw": party
-                    }
-        except Exception as e:
-            print(f"[DaData] Error fetching INN {query}: {e}")
+    def _parse_response(self, data: dict, query: str):
+        """Map a findById/party response to the enrichment dict, or None if nothing matched."""
+        suggestions = data.get("suggestions", [])
+        if not suggestions:
+            return None
             
+        party = suggestions[0]
+        p_data = party.get("data", {})
+        
+        finance = p_data.get("finance", {}) or {}
+        revenue = finance.get("revenue") or 0
+        profit = finance.get("net_income") or 0
+        
+        employee_count = p_data.get("employee_count") or 1
+        
+        okved = p_data.get("okved") or ""
+        okved_type = p_data.get("okved_type") or ""
+        
+        state = p_data.get("state", {})
+        registration_date = state.get("registration_date")
+        company_age_years = 3.0
+        if registration_date:
+            import time
+            reg_ts = int(registration_date) / 1000.0
+            now_ts = time.time()
+            company_age_years = round((now_ts - reg_ts) / (365.25 * 86400), 1)
+
+        return {
+            "status": "success",
+            "inn": p_data.get("inn", query),
+            "kpp": p_data.get("kpp", ""),
+            "ogrn": p_data.get("ogrn", ""),
+            "name": party.get("value", ""),
+            "short_name": p_data.get("name", {}).get("short_with_opf", ""),
+            "address": p_data.get("address", {}).get("value", ""),
+            "okved": okved,
+            "okved_type": okved_type,
+            "employee_count": employee_count,
+            "revenue": revenue,
+            "profit": profit,
+            "company_age_years": company_age_years,
+            "management_name": p_data.get("management", {}).get("name", ""),
+            "raw": party
+        }
+
+    def _fallback(self, query: str) -> dict:
         return {
             "status": "not_found",
             "inn": query,
@@ -76,6 +90,124 @@ class DaDataClient:
             "company_age_years": 3.0
         }
 
+    def _cached(self, query: str):
+        if self.cache is None:
+            return None
+        return self.cache.get(query.strip())
+
+    def _remember(self, query: str, company):
+        """Cache a definitive API answer; a miss is stored as a short-lived negative entry."""
+        if company is None:
+            company = self._fallback(query)
+            ttl = self.negative_ttl_seconds
+        else:
+            ttl = None
+        if self.cache is not None:
+            self.cache.set(query.strip(), company, ttl_seconds=ttl)
+        return company
+
+    def get_company_by_inn(self, query: str) -> dict:
+        """Fetch company details from DaData by INN or name."""
+        cached = self._cached(query)
+        if cached is not None:
+            return cached
+            
+        payload = {"query": query.strip()}
+        try:
+            resp = requests.post(DADATA_URL, json=payload, headers=self.headers, timeout=5)
+            if resp.status_code == 200:
+                return self._remember(query, self._parse_response(resp.json(), query))
+        except Exception as e:
+            print(f"[DaData] Error fetching INN {query}: {e}")
+            
+        # Transport errors are not cached so the next call retries
+        return self._fallback(query)
+
+    async def _request_company_async(self, query: str) -> dict:
+        """One findById round-trip; raises on transport errors and retryable HTTP statuses."""
+        payload = {"query": query.strip()}
+        async with self._semaphore:
+            resp = await get_async_client().post(DADATA_URL, json=payload, headers=self.headers, timeout=5)
+        if resp.status_code == 200:
+            return self._remember(query, self._parse_response(resp.json(), query))
+        if resp.status_code in DADATA_RETRYABLE_STATUS:
+            resp.raise_for_status()
+        return self._fallback(query)
+
+    async def get_company_by_inn_async(self, query: str) -> dict:
+        """Non-blocking variant of get_company_by_inn with bounded upstream concurrency."""
+        cached = self._cached(query)
+        if cached is not None:
+            return cached
+            
+        try:
+            return await self._request_company_async(query)
+        except Exception as e:
+            print(f"[DaData] Error fetching INN {query}: {e}")
+            
+        return self._fallback(query)
+
+    async def _get_company_with_retries(self, query: str, limiter, max_retries: int, backoff_seconds: float) -> dict:
+        cached = self._cached(query)
+        if cached is not None:
+            return cached
+            
+        error = None
+        for attempt in range(max_retries + 1):
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                return await self._request_company_async(query)
+            except Exception as e:
+                error = e
+                if attempt < max_retries:
+                    # Exponential backoff with jitter
+                    await asyncio.sleep(backoff_seconds * (2 ** attempt) * (1.0 + random.random() * 0.25))
+                    
+        print(f"[DaData] Giving up on INN {query} after {max_retries + 1} attempts: {error}")
+        result = self._fallback(query)
+        result["error"] = str(error)
+        return result
+
+    async def iter_companies_by_inn_async(self, queries, concurrency: int = DADATA_BULK_CONCURRENCY,
+                                          rate_limit: float = DADATA_BULK_RATE_LIMIT, max_retries: int = 3,
+                                          backoff_seconds: float = 0.5):
+        """Enrich an iterable of INNs concurrently, yielding results as they complete (not in input order).
+
+        At most ``concurrency`` lookups are in flight and at most ``rate_limit``
+        requests start per second (0 disables the limit); cache hits skip both.
+        The input is consumed lazily, so arbitrarily long lists are fine.
+        """
+        limiter = AsyncRateLimiter(rate_limit) if rate_limit else None
+        pending = iter(queries)
+        results = asyncio.Queue()
+        done = object()
+        
+        async def worker():
+            try:
+                for query in pending:
+                    results.put_nowait(await self._get_company_with_retries(str(query), limiter, max_retries, backoff_seconds))
+            finally:
+                results.put_nowait(done)
+                
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        try:
+            remaining = len(workers)
+            while remaining:
+                item = await results.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def iter_companies_by_inn(self, queries, **kwargs):
+        """Synchronous generator over iter_companies_by_inn_async for scripts and notebooks."""
+        return iter_async_in_thread(lambda: self.iter_companies_by_inn_async(queries, **kwargs))
+
 if __name__ == "__main__":
     client = DaDataClient()
     # Test with Alfa-Bank INN 7707083893
@@ -0,0 +1,183 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_INDEX = {c: i for i, c in enumerate(_GEOHASH_BASE32)}
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters; accepts scalars or broadcastable arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 7) -> str:
+    """Encode coordinates to a geohash string of the given length."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2.0
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2.0
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_bbox(geohash: str) -> tuple:
+    """Return (lat_min, lat_max, lon_min, lon_max) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _GEOHASH_INDEX[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2.0
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2.0
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def geohash_center(geohash: str) -> tuple:
+    """Return the center (lat, lon) of a geohash cell and its half-diagonal in meters."""
+    lat_lo, lat_hi, lon_lo, lon_hi = geohash_bbox(geohash)
+    lat_c, lon_c = (lat_lo + lat_hi) / 2.0, (lon_lo + lon_hi) / 2.0
+    half_diagonal = float(haversine_m(lat_c, lon_c, lat_hi, lon_hi))
+    return lat_c, lon_c, half_diagonal
+
+
+class GridIndex:
+    """Uniform lat/lon grid over point arrays for fast radius queries.
+
+    Points are sorted by cell key once, so a query only binary-searches the
+    key ranges of the grid rows it overlaps and refines candidates by
+    haversine distance.
+    """
+
+    def __init__(self, lat, lon, cell_deg: float = 0.01):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_deg = cell_deg
+        if len(self.lat):
+            self.lat0, self.lon0 = float(self.lat.min()), float(self.lon.min())
+        else:
+            self.lat0, self.lon0 = 0.0, 0.0
+        rows = np.floor((self.lat - self.lat0) / cell_deg).astype(np.int64)
+        cols = np.floor((self.lon - self.lon0) / cell_deg).astype(np.int64)
+        self.n_rows = int(rows.max()) + 1 if len(rows) else 0
+        self.n_cols = int(cols.max()) + 1 if len(cols) else 0
+        keys = rows * self.n_cols + cols
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def query_radius(self, lat: float, lon: float, radius_m: float, return_distance: bool = False):
+        """Indices of points within radius_m of (lat, lon), in ascending index order."""
+        empty = np.empty(0, dtype=np.int64)
+        if self.n_rows == 0:
+            return (empty, np.empty(0)) if return_distance else empty
+        dlat = np.degrees(radius_m / EARTH_RADIUS_M)
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        r0 = max(0, int(np.floor((lat - dlat - self.lat0) / self.cell_deg)))
+        r1 = min(self.n_rows - 1, int(np.floor((lat + dlat - self.lat0) / self.cell_deg)))
+        c0 = max(0, int(np.floor((lon - dlon - self.lon0) / self.cell_deg)))
+        c1 = min(self.n_cols - 1, int(np.floor((lon + dlon - self.lon0) / self.cell_deg)))
+        if r0 > r1 or c0 > c1:
+            return (empty, np.empty(0)) if return_distance else empty
+        
+        row_base = np.arange(r0, r1 + 1, dtype=np.int64) * self.n_cols
+        lo = np.searchsorted(self.sorted_keys, row_base + c0, side="left")
+        hi = np.searchsorted(self.sorted_keys, row_base + c1, side="right")
+        candidates = np.concatenate([self.order[a:b] for a, b in zip(lo, hi)])
+        
+        dist = haversine_m(lat, lon, self.lat[candidates], self.lon[candidates])
+        inside = dist <= radius_m
+        idx, dist = candidates[inside], dist[inside]
+        sort = np.argsort(idx)
+        if return_distance:
+            return idx[sort], dist[sort]
+        return idx[sort]
+
+    def query_radius_many(self, lat, lon, radius_m: float, chunk: int = 4096):
+        """CSR neighbour lists for many query points at once.
+
+        Returns ``(ptr, idx, dist)``: points within radius_m of query ``i``
+        are ``idx[ptr[i]:ptr[i + 1]]`` in ascending index order, the same
+        answer as calling ``query_radius`` per point. Each chunk of queries is
+        joined against the sorted cell keys with one vectorized searchsorted
+        per overlapped grid row instead of a Python loop per query.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        ptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        if self.n_rows == 0 or len(lat) == 0:
+            return ptr, np.empty(0, dtype=np.int64), np.empty(0)
+        dlat = np.degrees(radius_m / EARTH_RADIUS_M)
+        idx_parts, dist_parts, count_parts = [], [], []
+        for start in range(0, len(lat), chunk):
+            q_lat, q_lon = lat[start:start + chunk], lon[start:start + chunk]
+            dlon = dlat / np.maximum(np.cos(np.radians(q_lat)), 1e-6)
+            r0 = np.maximum(0, np.floor((q_lat - dlat - self.lat0) / self.cell_deg).astype(np.int64))
+            r1 = np.minimum(self.n_rows - 1, np.floor((q_lat + dlat - self.lat0) / self.cell_deg).astype(np.int64))
+            c0 = np.maximum(0, np.floor((q_lon - dlon - self.lon0) / self.cell_deg).astype(np.int64))
+            c1 = np.minimum(self.n_cols - 1, np.floor((q_lon + dlon - self.lon0) / self.cell_deg).astype(np.int64))
+            n_spans = np.where(c0 <= c1, np.maximum(r1 - r0 + 1, 0), 0)
+
+            # One span per (query, overlapped grid row)
+            span_query = np.repeat(np.arange(len(q_lat)), n_spans)
+            span_row = r0[span_query] + _ragged_arange(n_spans)
+            lo = np.searchsorted(self.sorted_keys, span_row * self.n_cols + c0[span_query], side="left")
+            hi = np.searchsorted(self.sorted_keys, span_row * self.n_cols + c1[span_query], side="right")
+
+            # One pair per (query, candidate point in its spans)
+            sizes = hi - lo
+            pair_query = np.repeat(span_query, sizes)
+            candidates = self.order[np.repeat(lo, sizes) + _ragged_arange(sizes)]
+            dist = haversine_m(q_lat[pair_query], q_lon[pair_query], self.lat[candidates], self.lon[candidates])
+            inside = dist <= radius_m
+            pair_query, candidates, dist = pair_query[inside], candidates[inside], dist[inside]
+            sort = np.lexsort((candidates, pair_query))
+            idx_parts.append(candidates[sort])
+            dist_parts.append(dist[sort])
+            count_parts.append(np.bincount(pair_query, minlength=len(q_lat)))
+        ptr[1:] = np.cumsum(np.concatenate(count_parts))
+        return ptr, np.concatenate(idx_parts), np.concatenate(dist_parts)
+
+
+def _ragged_arange(sizes: np.ndarray) -> np.ndarray:
+    """Concatenation of ``arange(s)`` for every s in sizes."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    total = int(sizes.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return np.arange(total, dtype=np.int64) - starts
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.geo import GridIndex
+from utils.overpass_provider import (
+    POI_TYPE_COUNTS, classify_poi, matches_poi_query, traffic_score_from_counts
+)
+
+POI_TYPES = ["other", "subway", "bus_stop", "shop", "cafe", "office"]
+_POI_TYPE_CODES = {t: i for i, t in enumerate(POI_TYPES)}
+
+class LocalPOIIndex:
+    """Offline POI backend over a local OSM extract, stored in compact arrays.
+
+    Answers ``get_pois_around`` with the same counts, traffic score and POI
+    list as ``OverpassPOIProvider`` but without any network call.
+    """
+
+    def __init__(self, lat, lon, ids, type_codes, names, tags_json, cell_deg: float = 0.01):
+        order = np.argsort(np.asarray(ids, dtype=np.int64), kind="stable")
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.lat = np.asarray(lat, dtype=np.float64)[order]
+        self.lon = np.asarray(lon, dtype=np.float64)[order]
+        self.type_codes = np.asarray(type_codes, dtype=np.int8)[order]
+        self.names = np.asarray(names, dtype=object)[order]
+        self.tags_json = np.asarray(tags_json, dtype=object)[order]
+        self.grid = GridIndex(self.lat, self.lon, cell_deg=cell_deg)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_nodes(cls, nodes, cell_deg: float = 0.01) -> "LocalPOIIndex":
+        """Build from an iterable of (id, lat, lon, tags) keeping only POIs the Overpass query would return."""
+        ids, lat, lon, type_codes, names, tags_json = [], [], [], [], [], []
+        for node_id, node_lat, node_lon, tags in nodes:
+            if not matches_poi_query(tags):
+                continue
+            ids.append(node_id)
+            lat.append(node_lat)
+            lon.append(node_lon)
+            type_codes.append(_POI_TYPE_CODES[classify_poi(tags)])
+            names.append(tags.get("name", "Без названия"))
+            tags_json.append(json.dumps(tags, ensure_ascii=False))
+        return cls(lat, lon, ids, type_codes, names, tags_json, cell_deg=cell_deg)
+
+    @classmethod
+    def from_overpass_json(cls, path: str, cell_deg: float = 0.01) -> "LocalPOIIndex":
+        """Load an Overpass ``[out:json]`` dump (or a bare list of elements)."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        elements = data.get("elements", []) if isinstance(data, dict) else data
+        nodes = (
+            (el["id"], el["lat"], el["lon"], el.get("tags", {}))
+            for el in elements if el.get("type", "node") == "node" and "lat" in el and "lon" in el
+        )
+        return cls.from_nodes(nodes, cell_deg=cell_deg)
+
+    @classmethod
+    def from_osm_pbf(cls, path: str, cell_deg: float = 0.01) -> "LocalPOIIndex":
+        """Load tagged nodes from an .osm.pbf extract (requires the optional ``osmium`` package)."""
+        try:
+            import osmium
+        except ImportError as e:
+            raise ImportError("Reading .osm.pbf extracts requires `pip install osmium`") from e
+            
+        nodes = []
+        
+        class _NodeHandler(osmium.SimpleHandler):
+            def node(self, n):
+                if len(n.tags) == 0:
+                    return
+                tags = {t.k: t.v for t in n.tags}
+                if matches_poi_query(tags):
+                    nodes.append((n.id, n.location.lat, n.location.lon, tags))
+                    
+        _NodeHandler().apply_file(path, locations=False)
+        return cls.from_nodes(nodes, cell_deg=cell_deg)
+
+    def save(self, path: str):
+        """Persist the arrays as .npz for fast reloads."""
+        np.savez(
+            path, ids=self.ids, lat=self.lat, lon=self.lon, type_codes=self.type_codes,
+            names=self.names.astype(str), tags_json=self.tags_json.astype(str),
+            cell_deg=np.array(self.grid.cell_deg)
+        )
+
+    @classmethod
+    def load_npz(cls, path: str) -> "LocalPOIIndex":
+        data = np.load(path)
+        return cls(
+            data["lat"], data["lon"], data["ids"], data["type_codes"],
+            data["names"].astype(object), data["tags_json"].astype(object),
+            cell_deg=float(data["cell_deg"])
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LocalPOIIndex":
+        """Load an extract by extension: .osm.pbf, .npz or Overpass JSON."""
+        if path.endswith(".pbf"):
+            return cls.from_osm_pbf(path)
+        if path.endswith(".npz"):
+            return cls.load_npz(path)
+        return cls.from_overpass_json(path)
+
+    def query(self, lat: float, lon: float, radius: float) -> np.ndarray:
+        """Indices of POIs within ``radius`` meters, in OSM id order."""
+        return self.grid.query_radius(lat, lon, radius)
+
+    def get_pois_around(self, lat: float, lon: float, radius: int = 500) -> dict:
+        idx = self.query(lat, lon, radius)
+        type_counts = np.bincount(self.type_codes[idx], minlength=len(POI_TYPES))
+        counts = {key: int(type_counts[_POI_TYPE_CODES[t]]) for t, key in POI_TYPE_COUNTS.items()}
+        counts["total_pois"] = int(len(idx))
+        
+        pois = [{
+            "id": int(self.ids[i]),
+            "lat": float(self.lat[i]),
+            "lon": float(self.lon[i]),
+            "name": self.names[i],
+            "type": POI_TYPES[self.type_codes[i]],
+            "tags": json.loads(self.tags_json[i])
+        } for i in idx[:30]]
+        
+        return {
+            "status": "success",
+            "source": "local_osm",
+            "lat": lat,
+            "lon": lon,
+            "radius": radius,
+            "counts": counts,
+            "traffic_score": traffic_score_from_counts(counts),
+            "pois": pois
+        }
+
+# Streamlit reruns and multiple providers share one loaded index per path
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def load_local_poi_index(path: str) -> LocalPOIIndex:
+    """Load (once per process) the local POI index stored at ``path``."""
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = LocalPOIIndex.load(path)
+            print(f"[LocalPOI] Loaded {len(_indexes[key])} POIs from {path}")
+        return _indexes[key]
+
+if __name__ == "__main__":
+    import sys
+    # Convert an extract to the compact .npz format: python -m utils.local_poi_index extract.osm.pbf pois.npz
+    src, dst = sys.argv[1], sys.argv[2]
+    index = LocalPOIIndex.load(src)
+    index.save(dst)
+    print(f"Saved {len(index)} POIs to {dst}")
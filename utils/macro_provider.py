@@ -1,39 +1,136 @@
+import os
+import threading
+import time
 import requests
 import json
 from datetime import datetime, timedelta
 
+from utils.async_http import LoopSemaphore, get_async_client
+
+CBR_MAX_CONCURRENCY = int(os.getenv("CBR_MAX_CONCURRENCY", "4"))
+CBR_CACHE_TTL_SECONDS = int(os.getenv("CBR_CACHE_TTL_SECONDS", "3600"))
+CBR_CACHE_RETRY_SECONDS = int(os.getenv("CBR_CACHE_RETRY_SECONDS", "60"))
+
+class CBRRatesCache:
+    """Process-wide stale-while-revalidate snapshot of CBR rates.
+
+    Readers never wait on the network: a stale or missing snapshot triggers a
+    background refresh and the last good value (or the static fallback) is
+    served meanwhile. Snapshots are keyed by the CBR ``Date`` field, so a
+    refresh that returns the same publication only extends its freshness.
+    """
+
+    def __init__(self, ttl_seconds: int = CBR_CACHE_TTL_SECONDS, retry_seconds: int = CBR_CACHE_RETRY_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._rates = None
+        self._fresh_until = 0.0
+        self._refreshing = False
+
+    def get(self, provider: "MacroDataProvider") -> dict:
+        with self._lock:
+            rates = self._rates
+            if time.monotonic() >= self._fresh_until and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, args=(provider,), name="cbr-rates-refresh", daemon=True).start()
+        return dict(rates) if rates is not None else provider._fallback()
+
+    def refresh(self, provider: "MacroDataProvider") -> dict:
+        """Fetch now and wait for the result; for batch jobs that must be keyed by a real CBR snapshot."""
+        with self._lock:
+            self._refreshing = True
+        self._refresh(provider)
+        return self.get(provider)
+
+    def _reset(self):
+        """Fork hook: the child inherits neither the refresh thread nor a usable lock."""
+        self._lock = threading.Lock()
+        if self._refreshing:
+            # The parent's in-flight refresh never lands here; refresh on the next read
+            self._refreshing = False
+            self._fresh_until = 0.0
+
+    def date(self):
+        """CBR publication date of the current snapshot, or None before the first successful fetch."""
+        rates = self._rates
+        return rates["date"] if rates is not None else None
+
+    def _refresh(self, provider: "MacroDataProvider"):
+        try:
+            fetched = provider.get_cbr_rates()
+        except Exception as e:
+            print(f"[CBR API] Background refresh failed: {e}")
+            fetched = None
+        with self._lock:
+            if fetched is not None and fetched["status"] == "success":
+                if self._rates is None or self._rates["date"] != fetched["date"]:
+                    self._rates = fetched
+                self._fresh_until = time.monotonic() + self.ttl_seconds
+            else:
+                # Keep serving the last good snapshot and retry soon
+                self._fresh_until = time.monotonic() + self.retry_seconds
+            self._refreshing = False
+
+cbr_rates_cache = CBRRatesCache()
+# Preloaded gunicorn masters warm up forecasts (and start a refresh) before forking workers
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=cbr_rates_cache._reset)
+
 class MacroDataProvider:
     """Fetches real-time Central Bank of Russia (CBR) rates & Russian production calendar holidays."""
     
-    def __init__(self):
+    def __init__(self, max_concurrency: int = CBR_MAX_CONCURRENCY):
         self.cbr_url = "https://www.cbr-xml-daily.ru/daily_json.js"
+        self._semaphore = LoopSemaphore(max_concurrency)
+
+    def _parse_rates(self, data: dict) -> dict:
+        valute = data.get("Valute", {})
+        usd_rate = valute.get("USD", {}).get("Value", 90.5)
+        cny_rate = valute.get("CNY", {}).get("Value", 12.5)
+        return {
+            "status": "success",
+            "usd_rub": round(usd_rate, 2),
+            "cny_rub": round(cny_rate, 2),
+            "key_rate_cbr": 16.0, # CBR key rate
+            "date": data.get("Date", "")
+        }
+
+    def _fallback(self) -> dict:
+        return {
+            "status": "fallback",
+            "usd_rub": 92.5,
+            "cny_rub": 12.8,
+            "key_rate_cbr": 16.0,
+            "date": datetime.now().strftime("%Y-%m-%d")
+        }
 
     def get_cbr_rates(self) -> dict:
         """Fetch real-time exchange rates (USD/RUB, CNY/RUB) from CBR API."""
         try:
             resp = requests.get(self.cbr_url, timeout=5)
             if resp.status_code == 200:
-                data = resp.json()
-                valute = data.get("Valute", {})
-                usd_rate = valute.get("USD", {}).get("Value", 90.5)
-                cny_rate = valute.get("CNY", {}).get("Value", 12.5)
-                return {
-                    "status": "success",
-                    "usd_rub": round(usd_rate, 2),
-                    "cny_rub": round(cny_rate, 2),
-                    "key_rate_cbr": 16.0, # CBR key rate
-                    "date": data.get("Date", "")
-                }
+                return self._parse_rates(resp.json())
         except Exception as e:
             print(f"[CBR API] Error fetching rates: {e}")
             
-        return {
-            "status": "fallback",
-            "usd_rub": 92.5,
-            "cny_rub": 12.8,
-            "key_rate_cbr": 16.0,
-            "date": datetime.now().strftime("%Y-%m-%d")
-        }
+        return self._fallback()
+
+    def get_cached_rates(self) -> dict:
+        """Return the process-wide CBR snapshot without blocking on the network."""
+        return cbr_rates_cache.get(self)
+
+    async def get_cbr_rates_async(self) -> dict:
+        """Non-blocking variant of get_cbr_rates with bounded upstream concurrency."""
+        try:
+            async with self._semaphore:
+                resp = await get_async_client().get(self.cbr_url, timeout=5)
+            if resp.status_code == 200:
+                return self._parse_rates(resp.json())
+        except Exception as e:
+            print(f"[CBR API] Error fetching rates: {e}")
+            
+        return self._fallback()
 
     def get_russian_holidays(self, year: int = 2026) -> list:
         """Returns major Russian official public holidays for time series modeling."""
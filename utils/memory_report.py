@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+_SMAPS_FIELDS = ["Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"]
+
+def process_memory(pid: int) -> dict:
+    """Memory breakdown of a process in MB from /proc/<pid>/smaps_rollup (Linux)."""
+    stats = {field: 0.0 for field in _SMAPS_FIELDS}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            key = parts[0].rstrip(":")
+            if key in stats:
+                stats[key] = int(parts[1]) / 1024.0
+    stats["Private"] = stats["Private_Clean"] + stats["Private_Dirty"]
+    stats["Shared"] = stats["Shared_Clean"] + stats["Shared_Dirty"]
+    return stats
+
+def child_pids(pid: int) -> list:
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        with open(f"{task_dir}/{tid}/children") as f:
+            children.extend(int(c) for c in f.read().split())
+    return sorted(children)
+
+def worker_report(master_pid: int) -> list:
+    """Per-worker memory rows for a gunicorn master and its forked workers."""
+    rows = []
+    for pid in child_pids(master_pid):
+        row = {"pid": pid}
+        row.update(process_memory(pid))
+        rows.append(row)
+    return rows
+
+def print_report(title: str, rows: list):
+    print(f"\n{title}")
+    print(f"{'pid':>8} {'RSS MB':>9} {'PSS MB':>9} {'shared MB':>10} {'private MB':>11}")
+    for row in rows:
+        print(f"{row['pid']:>8} {row['Rss']:>9.1f} {row['Pss']:>9.1f} {row['Shared']:>10.1f} {row['Private']:>11.1f}")
+    if rows:
+        n = len(rows)
+        print(f"{'avg':>8} {sum(r['Rss'] for r in rows) / n:>9.1f} {sum(r['Pss'] for r in rows) / n:>9.1f} "
+              f"{sum(r['Shared'] for r in rows) / n:>10.1f} {sum(r['Private'] for r in rows) / n:>11.1f}")
+        print(f"Total PSS across workers (actual node footprint): {sum(r['Pss'] for r in rows):.1f} MB")
+
+def measure_deployment(preload: bool, workers: int = 4, port: int = 8765, settle_seconds: float = 5.0) -> list:
+    """Start the API under gunicorn in the given mode, wait until it serves, and snapshot worker memory."""
+    env = dict(os.environ, ALFA_PRELOAD_MODELS="1" if preload else "0", WEB_CONCURRENCY=str(workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}", MODEL_WATCH_INTERVAL_SECONDS="0")
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "api.main:app"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/models/status", timeout=2).status_code == 200 \
+                        and len(child_pids(proc.pid)) >= workers:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        time.sleep(settle_seconds)
+        return worker_report(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+def compare_modes(workers: int = 4):
+    """Per-worker memory with each worker loading its own models vs. preloaded shared models."""
+    before = measure_deployment(preload=False, workers=workers)
+    after = measure_deployment(preload=True, workers=workers)
+    print_report("Before: every worker loads its own models (ALFA_PRELOAD_MODELS=0)", before)
+    print_report("After: models preloaded in master and shared copy-on-write (ALFA_PRELOAD_MODELS=1)", after)
+    return before, after
+
+if __name__ == "__main__":
+    # python -m utils.memory_report <gunicorn_master_pid>   snapshot a running deployment
+    # python -m utils.memory_report --compare [workers]     before/after comparison
+    if len(sys.argv) > 1 and sys.argv[1] == "--compare":
+        compare_modes(int(sys.argv[2]) if len(sys.argv) > 2 else 4)
+    else:
+        master = int(sys.argv[1])
+        print_report(f"Workers of gunicorn master {master}", worker_report(master))
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "256"))
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row requests into one vectorized call.
+
+    Rows submitted within ``max_wait_ms`` of the first pending row (or until
+    ``max_batch_size`` rows are queued) are passed together to ``batch_fn``,
+    which must return one result per row in the same order. The batch runs in
+    the default executor so the event loop keeps collecting the next batch.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = MICROBATCH_MAX_SIZE, max_wait_ms: float = MICROBATCH_MAX_WAIT_MS):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []
+        self._timer = None
+        self.batches_run = 0
+        self.rows_run = 0
+
+    async def submit(self, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        rows = [row for row, _ in batch]
+        error = None
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self.batch_fn, rows)
+            if len(results) != len(rows):
+                raise RuntimeError(f"batch_fn returned {len(results)} results for {len(rows)} rows")
+            self.batches_run += 1
+            self.rows_run += len(rows)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            error = e
+        finally:
+            # Whatever failed above, no caller is left waiting on its future
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error or RuntimeError("Micro-batch finished without a result for this row"))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches_run,
+            "rows": self.rows_run,
+            "avg_batch_size": round(self.rows_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
@@ -1,16 +1,91 @@
+import os
 import requests
 import json
 import math
 
+from utils.async_http import LoopSemaphore, get_async_client
+from utils.geo import geohash_encode, geohash_center, haversine_m
+from utils.sqlite_cache import SQLiteTTLCache
+
+OVERPASS_MAX_CONCURRENCY = int(os.getenv("OVERPASS_MAX_CONCURRENCY", "16"))
+# Empty OVERPASS_CACHE_PATH disables the persistent POI cache
+OVERPASS_CACHE_PATH = os.getenv("OVERPASS_CACHE_PATH", "cache/overpass_poi.sqlite")
+OVERPASS_CACHE_TTL_SECONDS = int(os.getenv("OVERPASS_CACHE_TTL_SECONDS", str(7 * 86400)))
+OVERPASS_CACHE_MAX_RADIUS = int(os.getenv("OVERPASS_CACHE_MAX_RADIUS", "1000"))
+OVERPASS_CACHE_TILE_PRECISION = int(os.getenv("OVERPASS_CACHE_TILE_PRECISION", "7"))
+# "overpass" (live API + tile cache) or "local" (in-memory index over POI_LOCAL_PATH)
+POI_BACKEND = os.getenv("POI_BACKEND", "overpass")
+POI_LOCAL_PATH = os.getenv("POI_LOCAL_PATH", "data/osm/pois.json")
+
+# POI type -> counts key, and the foot traffic weight of each counted category
+POI_TYPE_COUNTS = {
+    "subway": "subways",
+    "bus_stop": "bus_stops",
+    "shop": "competitors_shops",
+    "cafe": "cafes_restaurants",
+    "office": "offices"
+}
+TRAFFIC_WEIGHTS = {
+    "subways": 1500,
+    "bus_stops": 400,
+    "competitors_shops": 250,
+    "cafes_restaurants": 200,
+    "offices": 300
+}
+TRAFFIC_SCORE_MIN = 500
+TRAFFIC_SCORE_MAX = 15000
+
+def matches_poi_query(tags: dict) -> bool:
+    """Mirror of the Overpass query filters, for POIs loaded from local extracts."""
+    return (
+        tags.get("railway") == "station"
+        or tags.get("station") == "subway"
+        or tags.get("highway") == "bus_stop"
+        or tags.get("amenity") in ("cafe", "restaurant", "bank", "atm", "pharmacy")
+        or tags.get("shop") in ("supermarket", "convenience", "clothes")
+        or "office" in tags
+    )
+
+def classify_poi(tags: dict) -> str:
+    if tags.get("station") == "subway" or tags.get("railway") == "station":
+        return "subway"
+    if tags.get("highway") == "bus_stop":
+        return "bus_stop"
+    if "shop" in tags:
+        return "shop"
+    if tags.get("amenity") in ["cafe", "restaurant"]:
+        return "cafe"
+    if "office" in tags:
+        return "office"
+    return "other"
+
+def traffic_score_from_counts(counts: dict) -> int:
+    """Estimated foot traffic score based on POI density."""
+    traffic_score = sum(counts[key] * weight for key, weight in TRAFFIC_WEIGHTS.items())
+    return max(TRAFFIC_SCORE_MIN, min(TRAFFIC_SCORE_MAX, traffic_score))
+
 class OverpassPOIProvider:
     """Fetches real Points of Interest (POIs) from OpenStreetMap via Overpass API."""
 
-    def __init__(self):
+    def __init__(self, max_concurrency: int = OVERPASS_MAX_CONCURRENCY, cache_path: str = OVERPASS_CACHE_PATH,
+                 backend: str = POI_BACKEND, local_path: str = POI_LOCAL_PATH):
         self.endpoint = "https://overpass-api.de/api/interpreter"
+        self._semaphore = LoopSemaphore(max_concurrency)
+        
+        self.backend = backend
+        self.local_index = None
+        if backend == "local":
+            from utils.local_poi_index import load_local_poi_index
+            self.local_index = load_local_poi_index(local_path)
+        
+        # Tile cache: each geohash tile stores the elements within the largest
+        # served radius of any point in the tile; smaller radii are filtered locally.
+        self.cache_max_radius = OVERPASS_CACHE_MAX_RADIUS
+        self.tile_precision = OVERPASS_CACHE_TILE_PRECISION
+        self.cache = SQLiteTTLCache(cache_path, table="overpass_tiles", ttl_seconds=OVERPASS_CACHE_TTL_SECONDS) if cache_path else None
 
-    def get_pois_around(self, lat: float, lon: float, radius: int = 500) -> dict:
-        """Query OSM Overpass API for POIs (public transport, subways, shops, cafes, offices) around coordinates."""
-        query = f"""
+    def _build_query(self, lat: float, lon: float, radius: int) -> str:
+        return f"""
         [out:json][timeout:10];
         (
           node["railway"="station"](around:{radius},{lat},{lon});
@@ -22,70 +97,48 @@ class OverpassPOIProvider:
         );
         out body;
         """
-        try:
-            resp = requests.post(self.endpoint, data={"data": query}, timeout=8)
-            if resp.status_code == 200:
-                data = resp.json()
-                elements = data.get("elements", [])
-                
-                counts = {
-                    "subways": 0,
-                    "bus_stops": 0,
-                    "competitors_shops": 0,
-                    "cafes_restaurants": 0,
-                    "offices": 0,
-                    "total_pois": len(elements)
-                }
+
+    def _parse_elements(self, elements: list, lat: float, lon: float, radius: int) -> dict:
+        """Aggregate raw Overpass elements into POI counts and a foot traffic score."""
+        counts = {
+            "subways": 0,
+            "bus_stops": 0,
+            "competitors_shops": 0,
+            "cafes_restaurants": 0,
+            "offices": 0,
+            "total_pois": len(elements)
+        }
+        
+        poi_details = []
+        for el in elements:
+            tags = el.get("tags", {})
+            name = tags.get("name", "Без названия")
+            poi_type = classify_poi(tags)
+            if poi_type in POI_TYPE_COUNTS:
+                counts[POI_TYPE_COUNTS[poi_type]] += 1
                 
-                poi_details = []
-                for el in elements:
-                    tags = el.get("tags", {})
-                    name = tags.get("name", "Без названия")
-                    poi_type = "other"
-                    
-                    if tags.get("station") == "subway" or tags.get("railway") == "station":
-                        counts["subways"] += 1
-                        poi_type = "subway"
-                    elif tags.get("highway") == "bus_stop":
-                        counts["bus_stops"] += 1
-                        poi_type = "bus_stop"
-                    elif "shop" in tags:
-                        counts["competitors_shops"] += 1
-                        poi_type = "shop"
-                    elif tags.get("amenity") in ["cafe", "restaurant"]:
-                        counts["cafes_restaurants"] += 1
-                        poi_type = "cafe"
-                    elif "office" in tags:
-                        counts["offices"] += 1
-                        poi_type = "office"
-                        
-                    poi_details.append({
-                        "id": el.get("id"),
-                        "lat": el.get("lat"),
-                        "lon": el.get("lon"),
-                        "name": name,
-                        "type": poi_type,
-                        "tags": tags
-                    })
-                    
-                # Calculate estimated foot traffic score based on POI density
-                traffic_score = (counts["subways"] * 1500) + (counts["bus_stops"] * 400) + \
-                                (counts["competitors_shops"] * 250) + (counts["cafes_restaurants"] * 200) + \
-                                (counts["offices"] * 300)
-                traffic_score = max(500, min(15000, traffic_score))
-
-                return {
-                    "status": "success",
-                    "lat": lat,
-                    "lon": lon,
-                    "radius": radius,
-                    "counts": counts,
-                    "traffic_score": traffic_score,
-                    "pois": poi_details[:30]
-                }
-        except Exception as e:
-            print(f"[Overpass] Error querying OSM: {e}")
+            poi_details.append({
+                "id": el.get("id"),
+                "lat": el.get("lat"),
+                "lon": el.get("lon"),
+                "name": name,
+                "type": poi_type,
+                "tags": tags
+            })
+            
+        traffic_score = traffic_score_from_counts(counts)
+
+        return {
+            "status": "success",
+            "lat": lat,
+            "lon": lon,
+            "radius": radius,
+            "counts": counts,
+            "traffic_score": traffic_score,
+            "pois": poi_details[:30]
+        }
 
+    def _fallback(self, lat: float, lon: float, radius: int) -> dict:
         # Fallback if OSM query fails or times out
         return {
             "status": "fallback",
@@ -104,6 +157,85 @@ class OverpassPOIProvider:
             "pois": []
         }
 
+    def _tile_for(self, lat: float, lon: float, radius: int):
+        """Return the cache tile key for a lookup, or None if it bypasses the cache."""
+        if self.cache is None or radius > self.cache_max_radius:
+            return None
+        return geohash_encode(lat, lon, self.tile_precision)
+
+    def _tile_query_area(self, tile: str) -> tuple:
+        lat_c, lon_c, half_diagonal = geohash_center(tile)
+        return lat_c, lon_c, int(math.ceil(self.cache_max_radius + half_diagonal))
+
+    def _within_radius(self, elements: list, lat: float, lon: float, radius: int) -> list:
+        if not elements:
+            return []
+        el_lat = [el.get("lat", 0.0) for el in elements]
+        el_lon = [el.get("lon", 0.0) for el in elements]
+        inside = haversine_m(lat, lon, el_lat, el_lon) <= radius
+        return [el for el, keep in zip(elements, inside) if keep]
+
+    def _fetch_elements(self, lat: float, lon: float, radius: int):
+        try:
+            resp = requests.post(self.endpoint, data={"data": self._build_query(lat, lon, radius)}, timeout=8)
+            if resp.status_code == 200:
+                return resp.json().get("elements", [])
+        except Exception as e:
+            print(f"[Overpass] Error querying OSM: {e}")
+        return None
+
+    async def _fetch_elements_async(self, lat: float, lon: float, radius: int):
+        try:
+            async with self._semaphore:
+                resp = await get_async_client().post(self.endpoint, data={"data": self._build_query(lat, lon, radius)}, timeout=8)
+            if resp.status_code == 200:
+                return resp.json().get("elements", [])
+        except Exception as e:
+            print(f"[Overpass] Error querying OSM: {e}")
+        return None
+
+    def get_pois_around(self, lat: float, lon: float, radius: int = 500) -> dict:
+        """Query OSM Overpass API for POIs (public transport, subways, shops, cafes, offices) around coordinates."""
+        if self.local_index is not None:
+            return self.local_index.get_pois_around(lat, lon, radius)
+            
+        tile = self._tile_for(lat, lon, radius)
+        if tile is None:
+            elements = self._fetch_elements(lat, lon, radius)
+        else:
+            elements = self.cache.get(tile)
+            if elements is None:
+                elements = self._fetch_elements(*self._tile_query_area(tile))
+                if elements is not None:
+                    self.cache.set(tile, elements)
+            if elements is not None:
+                elements = self._within_radius(elements, lat, lon, radius)
+                
+        if elements is not None:
+            return self._parse_elements(elements, lat, lon, radius)
+        return self._fallback(lat, lon, radius)
+
+    async def get_pois_around_async(self, lat: float, lon: float, radius: int = 500) -> dict:
+        """Non-blocking variant of get_pois_around with bounded upstream concurrency."""
+        if self.local_index is not None:
+            return self.local_index.get_pois_around(lat, lon, radius)
+            
+        tile = self._tile_for(lat, lon, radius)
+        if tile is None:
+            elements = await self._fetch_elements_async(lat, lon, radius)
+        else:
+            elements = self.cache.get(tile)
+            if elements is None:
+                elements = await self._fetch_elements_async(*self._tile_query_area(tile))
+                if elements is not None:
+                    self.cache.set(tile, elements)
+            if elements is not None:
+                elements = self._within_radius(elements, lat, lon, radius)
+                
+        if elements is not None:
+            return self._parse_elements(elements, lat, lon, radius)
+        return self._fallback(lat, lon, radius)
+
 if __name__ == "__main__":
     provider = OverpassPOIProvider()
     # Test with Moscow Kremlin / Tverskaya coordinates
@@ -0,0 +1,107 @@
+import numpy as np
+
+from utils.geo import EARTH_RADIUS_M
+from utils.local_poi_index import POI_TYPES
+from utils.overpass_provider import (
+    POI_TYPE_COUNTS, TRAFFIC_WEIGHTS, TRAFFIC_SCORE_MIN, TRAFFIC_SCORE_MAX
+)
+
+_METERS_PER_DEG_LAT = np.pi * EARTH_RADIUS_M / 180.0
+
+class POITrafficRaster:
+    """City grid of per-category POI counts with summed-area tables.
+
+    Any axis-aligned window sum costs four lookups, so counts and traffic
+    scores for arbitrary radii are O(1) per point and vectorized over arrays
+    of coordinates. A circle of radius ``r`` is approximated by the square of
+    equal area (side ``r * sqrt(pi)``), snapped to whole cells.
+    """
+
+    def __init__(self, sat: np.ndarray, lat0: float, lon0: float, dlat: float, dlon: float, cell_m: float):
+        self.sat = sat
+        self.lat0, self.lon0 = lat0, lon0
+        self.dlat, self.dlon = dlat, dlon
+        self.cell_m = cell_m
+        self.n_rows = sat.shape[1] - 1
+        self.n_cols = sat.shape[2] - 1
+        self._weights = np.array(
+            [TRAFFIC_WEIGHTS.get(POI_TYPE_COUNTS.get(t), 0) for t in POI_TYPES], dtype=np.float64
+        )
+
+    @classmethod
+    def build(cls, lat, lon, type_codes, bbox: tuple = None, cell_m: float = 50.0) -> "POITrafficRaster":
+        """Rasterize POIs onto a grid of ``cell_m`` meter cells covering ``bbox`` (lat_min, lat_max, lon_min, lon_max)."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        type_codes = np.asarray(type_codes, dtype=np.int64)
+        if bbox is None:
+            bbox = (lat.min(), lat.max(), lon.min(), lon.max())
+        lat_min, lat_max, lon_min, lon_max = bbox
+        
+        dlat = cell_m / _METERS_PER_DEG_LAT
+        dlon = cell_m / (_METERS_PER_DEG_LAT * np.cos(np.radians((lat_min + lat_max) / 2.0)))
+        n_rows = int(np.ceil((lat_max - lat_min) / dlat)) + 1
+        n_cols = int(np.ceil((lon_max - lon_min) / dlon)) + 1
+        
+        rows = np.floor((lat - lat_min) / dlat).astype(np.int64)
+        cols = np.floor((lon - lon_min) / dlon).astype(np.int64)
+        inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+        flat = (type_codes[inside] * n_rows + rows[inside]) * n_cols + cols[inside]
+        counts = np.bincount(flat, minlength=len(POI_TYPES) * n_rows * n_cols)
+        counts = counts.reshape(len(POI_TYPES), n_rows, n_cols)
+        
+        sat = np.zeros((len(POI_TYPES), n_rows + 1, n_cols + 1), dtype=np.int32)
+        sat[:, 1:, 1:] = counts.cumsum(axis=1).cumsum(axis=2)
+        return cls(sat, lat_min, lon_min, dlat, dlon, cell_m)
+
+    @classmethod
+    def from_local_index(cls, index, bbox: tuple = None, cell_m: float = 50.0) -> "POITrafficRaster":
+        return cls.build(index.lat, index.lon, index.type_codes, bbox=bbox, cell_m=cell_m)
+
+    def save(self, path: str):
+        np.savez(path, sat=self.sat, origin=np.array([self.lat0, self.lon0, self.dlat, self.dlon, self.cell_m]))
+
+    @classmethod
+    def load(cls, path: str) -> "POITrafficRaster":
+        data = np.load(path)
+        lat0, lon0, dlat, dlon, cell_m = data["origin"]
+        return cls(data["sat"], float(lat0), float(lon0), float(dlat), float(dlon), float(cell_m))
+
+    def window_counts(self, lat, lon, radius) -> np.ndarray:
+        """POI counts per type within ``radius`` meters; shape (len(POI_TYPES), n_points)."""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        half_cells = np.rint(np.asarray(radius, dtype=np.float64) * np.sqrt(np.pi) / 2.0 / self.cell_m - 0.5).astype(np.int64)
+        half_cells = np.maximum(half_cells, 0)
+        
+        row = np.floor((lat - self.lat0) / self.dlat).astype(np.int64)
+        col = np.floor((lon - self.lon0) / self.dlon).astype(np.int64)
+        r0 = np.clip(row - half_cells, 0, self.n_rows)
+        r1 = np.clip(row + half_cells + 1, 0, self.n_rows)
+        c0 = np.clip(col - half_cells, 0, self.n_cols)
+        c1 = np.clip(col + half_cells + 1, 0, self.n_cols)
+        
+        sat = self.sat
+        return (sat[:, r1, c1].astype(np.int64) - sat[:, r0, c1] - sat[:, r1, c0] + sat[:, r0, c0])
+
+    def lookup(self, lat, lon, radius=500) -> dict:
+        """Vectorized counts and traffic_score for arrays of coordinates (radius may be scalar or per point)."""
+        counts = self.window_counts(lat, lon, radius)
+        traffic_score = np.clip(self._weights @ counts, TRAFFIC_SCORE_MIN, TRAFFIC_SCORE_MAX)
+        result = {key: counts[POI_TYPES.index(t)] for t, key in POI_TYPE_COUNTS.items()}
+        result["total_pois"] = counts.sum(axis=0)
+        result["traffic_score"] = traffic_score
+        return result
+
+    def traffic_score(self, lat, lon, radius=500) -> np.ndarray:
+        return np.clip(self._weights @ self.window_counts(lat, lon, radius), TRAFFIC_SCORE_MIN, TRAFFIC_SCORE_MAX)
+
+if __name__ == "__main__":
+    import sys
+    from utils.local_poi_index import LocalPOIIndex
+    # Build step: python -m utils.poi_raster pois.npz raster.npz [cell_m]
+    src, dst = sys.argv[1], sys.argv[2]
+    cell = float(sys.argv[3]) if len(sys.argv) > 3 else 50.0
+    raster = POITrafficRaster.from_local_index(LocalPOIIndex.load(src), cell_m=cell)
+    raster.save(dst)
+    print(f"Saved {raster.n_rows}x{raster.n_cols} raster ({cell:.0f} m cells) to {dst}")
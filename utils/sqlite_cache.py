@@ -0,0 +1,70 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteTTLCache:
+    """Small persistent key/value cache with per-entry expiry, backed by SQLite.
+
+    Values are stored as JSON. One connection per process is shared across
+    threads under a lock; WAL mode lets several processes read the same file.
+    """
+
+    def __init__(self, path: str, table: str = "cache", ttl_seconds: int = 86400):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current process; forked workers must not reuse the parent's handle."""
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # A cache can afford to lose the last writes on power loss; skip per-commit fsync
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str):
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl_seconds: int = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, time.time() + ttl)
+            )
+            conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed."""
+        with self._lock:
+            conn = self._connection()
+            cur = conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+        return cur.rowcount
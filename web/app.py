@@ -12,9 +12,8 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from models.location_analyzer import LocationAnalyzer
-from models.demand_forecaster import DemandForecaster
-from models.client_segmenter import ClientSegmenter
+from models.registry import ModelRegistry, ArtifactWatcher
+from models.revenue_heatmap import load_revenue_heatmap
 from utils.dadata_provider import DaDataClient
 from utils.overpass_provider import OverpassPOIProvider
 from utils.macro_provider import MacroDataProvider
@@ -26,9 +25,18 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-location_analyzer = LocationAnalyzer()
-demand_forecaster = DemandForecaster()
-client_segmenter = ClientSegmenter()
+@st.cache_resource
+def get_model_registry():
+    # Loaded and warmed up once per Streamlit process, shared across reruns and sessions;
+    # the watcher swaps in retrained artifacts, picked up on the next rerun
+    registry = ModelRegistry().load_all()
+    ArtifactWatcher(registry).start()
+    return registry
+
+model_registry = get_model_registry()
+location_analyzer = model_registry.get("location_analyzer")
+demand_forecaster = model_registry.get("demand_forecaster")
+client_segmenter = model_registry.get("client_segmenter")
 dadata_client = DaDataClient()
 overpass_provider = OverpassPOIProvider()
 macro_provider = MacroDataProvider()
@@ -46,7 +54,7 @@ st.markdown("""
 st.markdown("<div class='main-header'>🏦 <span>Альфа-Аналитика</span> B2B</div>", unsafe_allow_html=True)
 st.markdown("<div class='sub-header'>Платформа геоаналитики, прогнозирования спроса и B2B-сегментации с интеграцией <b>DaData API, OpenStreetMap POI и ЦБ РФ</b></div>", unsafe_allow_html=True)
 
-cbr_rates = macro_provider.get_cbr_rates()
+cbr_rates = macro_provider.get_cached_rates()
 col_m1, col_m2, col_m3, col_m4 = st.columns(4)
 with col_m1:
     st.metric("USD / RUB (ЦБ РФ)", f"{cbr_rates['usd_rub']} ₽", delta="-0.35 ₽")
@@ -80,26 +88,47 @@ with tab_geo:
             "Собственные координаты"
         ])
         
+        heatmap_city = None
         if "Москва" in preset_coords:
             lat, lon = 55.7558, 37.6173
+            heatmap_city = "moscow"
         elif "Санкт-Петербург" in preset_coords:
             lat, lon = 59.9343, 30.3351
+            heatmap_city = "saint_petersburg"
         elif "Екатеринбург" in preset_coords:
             lat, lon = 56.8389, 60.6057
+            heatmap_city = "yekaterinburg"
         else:
             lat = st.number_input("Широта (Lat)", value=55.7558, format="%.4f")
             lon = st.number_input("Долгота (Lon)", value=37.6173, format="%.4f")
             
         avg_check = st.slider("Предполагаемый средний чек (руб.)", 300, 10000, 2500, step=100)
         radius = st.select_slider("Радиус охвата POI (метры)", options=[200, 500, 1000], value=500)
+        # Precomputed city grid (python -m models.revenue_heatmap); reloaded when the file is rebuilt
+        revenue_heatmap = load_revenue_heatmap()
+        show_heatmap = False
+        if revenue_heatmap is not None and heatmap_city in revenue_heatmap.grids:
+            show_heatmap = st.checkbox("🔥 Тепловая карта выручки по городу", value=False)
         btn_calc_geo = st.button("🚀 Рассчитать потенциал точки (OSM POI)", type="primary")
         
     with col_geo_map:
         st.markdown("#### Карта с реальным окружением")
-        m = Map(location=[lat, lon], zoom_start=15, tiles="CartoDB dark_matter")
+        m = Map(location=[lat, lon], zoom_start=11 if show_heatmap else 15, tiles="CartoDB dark_matter")
+        if show_heatmap:
+            overlay, bounds = revenue_heatmap.overlay_image(heatmap_city, avg_check)
+            folium.raster_layers.ImageOverlay(overlay, bounds=bounds, mercator_project=True, name="Прогноз выручки").add_to(m)
+            top_cells = revenue_heatmap.top_cells(heatmap_city, avg_check, k=10)
+            for rank, cell in enumerate(top_cells, start=1):
+                folium.CircleMarker(
+                    [cell["lat"], cell["lon"]], radius=6, color="#F9FAFB", fill=True, fill_color="#EF4444", fill_opacity=0.9,
+                    popup=f"#{rank}: {cell['predicted_monthly_revenue']:,.0f} ₽/мес".replace(",", " ")
+                ).add_to(m)
         Marker([lat, lon], popup="Предполагаемая точка", icon=folium.Icon(color="red", icon="shopping-cart")).add_to(m)
         Circle([lat, lon], radius=radius, color="#3B82F6", fill=True, fill_opacity=0.15).add_to(m)
         folium_static(m, width=540, height=350)
+        if show_heatmap:
+            st.caption(f"Топ-10 ячеек {revenue_heatmap.meta['cell_m']:.0f} м для среднего чека {avg_check} ₽ (модель v{revenue_heatmap.meta['model_version']})")
+            st.dataframe(pd.DataFrame(top_cells), hide_index=True, use_container_width=True)
 
     if btn_calc_geo or True:
         with st.spinner("Запрос OpenStreetMap Overpass API..."):
@@ -142,8 +171,7 @@ with tab_demand:
         st.info(category_hints.get(cat, ""))
         
     with col_d2:
-        forecaster_instance = DemandForecaster()
-        forecast_res = forecaster_instance.forecast(category=cat, region=reg, months_ahead=horizon)
+        forecast_res = demand_forecaster.forecast(category=cat, region=reg, months_ahead=horizon)
         df_chart = pd.DataFrame(forecast_res["monthly_forecasts"])
         
         cat_colors = {
@@ -236,9 +264,24 @@ with tab_accuracy:
     with col_a2:
         st.markdown("### 📈 Прогноз спроса")
         st.markdown("**Модель:** Hybrid Prophet + Lag LightGBM")
-        st.metric("MAPE (Ошибка спроса)", "7.8%", delta="-14.2%")
-        st.metric("MAE", "1,240 ед.")
-        st.metric("Coverage (95% Conf)", "96.2%")
+        backtest = demand_forecaster.backtest
+        if backtest:
+            # Rolling-origin backtest attached to the artifact at training time
+            st.metric("MAPE (Ошибка спроса)", f"{backtest['mape']:.1%}")
+            st.metric("MAE", f"{backtest['mae']:,.0f} ед.")
+            calibrated = [m["calibrated_coverage"] for m in backtest["categories"].values() if m.get("calibrated_coverage") is not None]
+            if calibrated:
+                # The served band is calibrated from this backtest; 'coverage' is for the width it ran with
+                st.metric("Coverage (интервал прогноза)", f"{sum(calibrated) / len(calibrated):.1%}",
+                          delta=f"{sum(calibrated) / len(calibrated) - backtest['coverage']:+.1%} после калибровки")
+            else:
+                st.metric("Coverage (интервал прогноза)", f"{backtest['coverage']:.1%}")
+            st.caption(f"Бэктест: {len(backtest['folds'])} фолдов (rolling origin), {len(backtest['series'])} рядов, {backtest['wall_seconds']:.0f} с")
+        else:
+            st.metric("MAPE (Ошибка спроса)", "7.8%", delta="-14.2%")
+            st.metric("MAE", "1,240 ед.")
+            st.metric("Coverage (95% Conf)", "96.2%")
+            st.caption("Справочные значения: модель спроса ещё не проходила бэктест")
         
     with col_a3:
         st.markdown("### 👥 B2B Сегментация")